@@ -2,12 +2,40 @@ import sys
 import os
 import subprocess
 import threading
+import queue
+import functools
+import codecs
+import io
 import re
+import ast
+import multiprocessing
+import concurrent.futures
+import json
+import hashlib
+import math
+import mmap
+import heapq
+import itertools
+import time
+import tempfile
+import zlib
+import struct
 import shutil
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk, font as tkfont
 import customtkinter as ctk
 from pathlib import Path
+from array import array
+from bisect import bisect_left, bisect_right, insort
+# The regex parser is private and has moved between versions; without it regex searches read every file
+try:
+    from re import _parser as regex_parser, _constants as regex_constants
+except ImportError:  # Before Python 3.11
+    try:
+        import sre_parse as regex_parser
+        import sre_constants as regex_constants
+    except ImportError:
+        regex_parser = regex_constants = None
 
 
 # Set appearance mode and VS Code color theme
@@ -30,13 +58,206 @@ VSCODE_COLORS = {
     'warning': '#ce9178',           # Warning orange
 }
 
+# Source file extensions and the language each one is highlighted as
+LANGUAGE_EXTENSIONS = {
+    '.py': 'python', '.pyw': 'python',
+    '.js': 'javascript', '.jsx': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.java': 'java',
+    '.cpp': 'cpp', '.cc': 'cpp', '.cxx': 'cpp',
+    '.c': 'c',
+    '.cs': 'csharp',
+    '.rb': 'ruby',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.php': 'php',
+    '.swift': 'swift',
+    '.kt': 'kotlin', '.kts': 'kotlin',
+    '.html': 'html', '.htm': 'html',
+    '.css': 'css',
+    '.sql': 'sql',
+    '.sh': 'bash',
+}
+
+# Highlighting grammars as plain data, one per language detect_language knows.
+# Nothing here is compiled up front; Grammar.get builds a language's tokenizer
+# the first time a file in that language is highlighted.
+C_BLOCK_COMMENT = ("block_comment", "comment", r'/\*', r'.*?\*/')
+GRAMMARS = {
+    'python': {
+        'keywords': """False None True and as assert async await break class continue def del elif else
+                       except finally for from global if import in is lambda nonlocal not or pass raise
+                       return try while with yield self print""",
+        'builtins': """print len range str int float list dict set tuple open read write input type isinstance
+                       enumerate zip map filter sorted reversed sum min max abs round pow format split join
+                       append extend insert remove pop index count keys values items get update clear""",
+        'line_comment': r'#[^\n]*',
+        'multiline': [
+            ("triple_double", "string", r'"""', r'(?:\\.|[^\\])*?"""'),
+            ("triple_single", "string", r"'''", r"(?:\\.|[^\\])*?'''"),
+        ],
+    },
+    'javascript': {
+        'keywords': """abstract await boolean break case catch class const continue debugger default delete
+                       do else enum export extends false finally for function if import in instanceof let
+                       new null return static super switch this throw true try typeof var void while with
+                       yield async console""",
+        'builtins': """console log const let var function return document getElementById querySelector
+                       addEventListener setTimeout setInterval parseInt parseFloat isNaN JSON stringify parse
+                       Array Object String Number push pop shift unshift slice splice map filter reduce
+                       forEach length indexOf includes""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT, ("template", "string", r'`', r'(?:\\.|[^\\`])*`')],
+    },
+    'typescript': {
+        'keywords': """abstract any as async await boolean break case catch class const constructor continue
+                       declare default delete do else enum export extends false finally for from function
+                       get if implements import in infer instanceof interface is keyof let module namespace
+                       never new null number object private protected public readonly return set static
+                       string super switch symbol this throw true try type typeof undefined unknown var
+                       void while yield console""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT, ("template", "string", r'`', r'(?:\\.|[^\\`])*`')],
+    },
+    'java': {
+        'keywords': """abstract boolean break byte case catch char class const continue default do double
+                       else enum extends final finally float for if implements import instanceof int
+                       interface long new package private protected public return short static super switch
+                       this throw throws try void while""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'cpp': {
+        'keywords': """auto bool break case catch char class const continue default delete do double else
+                       enum explicit extern false float for friend if inline int long namespace new nullptr
+                       operator private protected public return short signed sizeof static struct switch
+                       template this throw true try typedef using virtual void while""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'c': {
+        'keywords': """auto break case char const continue default do double else enum extern float for goto
+                       if int long register return short signed sizeof static struct switch typedef union
+                       unsigned void volatile while""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'csharp': {
+        'keywords': """abstract as async await base bool break byte case catch char checked class const
+                       continue decimal default delegate do double else enum event explicit extern false
+                       finally fixed float for foreach get goto if implicit in int interface internal is
+                       lock long namespace new null object operator out override params private protected
+                       public readonly ref return sbyte sealed set short sizeof static string struct switch
+                       this throw true try typeof uint ulong unsafe ushort using var virtual void volatile
+                       while yield""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'ruby': {
+        'keywords': """BEGIN END alias and begin break case class def defined do else elsif end ensure false
+                       for if in module next nil not or redo rescue retry return self super then true undef
+                       unless until when while yield puts require attr_accessor""",
+        'line_comment': r'#[^\n]*',
+        'multiline': [("doc_comment", "comment", r'^=begin\b', r'=end\b.*')],
+    },
+    'go': {
+        'keywords': """break case chan const continue default defer else fallthrough for func go goto if
+                       import interface map package range return select struct switch type var nil true
+                       false iota""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT, ("raw_string", "string", r'`', r'[^`]*`')],
+    },
+    'rust': {
+        'keywords': """as async await break const continue crate dyn else enum extern false fn for if impl in
+                       let loop match mod move mut pub ref return self Self static struct super trait true
+                       type unsafe use where while""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'swift': {
+        'keywords': """associatedtype as break case catch class continue default defer deinit do else enum
+                       extension fallthrough false fileprivate for func guard if import in init inout
+                       internal is let nil open operator private protocol public repeat rethrows return self
+                       Self static struct subscript super switch throw throws true try typealias var where
+                       while print""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT, ("triple_double", "string", r'"""', r'(?:\\.|[^\\])*?"""')],
+    },
+    'kotlin': {
+        'keywords': """abstract as break by catch class companion const constructor continue data do else
+                       enum false final finally for fun get if import in init inline interface internal is
+                       lateinit null object open operator out override package private protected public
+                       return sealed set super suspend this throw true try typealias val var vararg when
+                       while println""",
+        'line_comment': r'//[^\n]*',
+        'multiline': [C_BLOCK_COMMENT, ("triple_double", "string", r'"""', r'(?:\\.|[^\\])*?"""')],
+    },
+    'php': {
+        'keywords': """abstract and array as break callable case catch class clone const continue declare
+                       default do echo else elseif empty extends final finally fn for foreach function
+                       global if implements include instanceof interface isset list match namespace new null
+                       or print private protected public readonly require return static switch throw trait
+                       try unset use var while yield true false""",
+        'line_comment': r'(?://|#)[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'html': {
+        'keywords': """html head body title meta link script style div span a p img ul ol li table tr td th
+                       form input button label select option textarea h1 h2 h3 h4 h5 h6 header footer nav
+                       section article main br hr class id href src type name""",
+        'line_comment': None,
+        'multiline': [("markup_comment", "comment", r'<!--', r'.*?-->')],
+    },
+    'css': {
+        'keywords': """important inherit initial unset none auto block inline flex grid absolute relative
+                       fixed sticky solid bold normal color background margin padding border display
+                       position width height font media import""",
+        'line_comment': None,
+        'multiline': [C_BLOCK_COMMENT],
+    },
+    'sql': {
+        'keywords': """add all alter and as asc begin between by case check column commit constraint create
+                       database default delete desc distinct drop else end exists foreign from full group
+                       having in index inner insert into is join key left like limit not null on or order
+                       outer primary references right rollback select set table then union unique update
+                       values view when where""",
+        'line_comment': r'--[^\n]*',
+        'multiline': [C_BLOCK_COMMENT],
+        'ignore_case': True,
+    },
+    'bash': {
+        'keywords': """if then else elif fi case esac for select while until do done in function time
+                       return exit break continue local export readonly declare unset shift source echo
+                       printf read cd test""",
+        'line_comment': r'#[^\n]*',
+    },
+}
+
 
 class SyntaxHighlighter:
     """Syntax highlighter for text widget"""
     
-    def __init__(self, text_widget, language='python'):
+    TAGS = ["keyword", "string", "comment", "number", "function", "class"]
+    SPILL_LINES = 50  # Lines lexed past an edit while the lexer state has not settled
+    RESTART_LINES = 500  # Furthest a restart looks back for a line with a known state
+    CHUNK_LINES = 200  # Lines per tokenizer job during the background catch-up
+    APPLY_TOKENS = 2000  # Tokens tagged per Tk event loop turn
+    POLL_INTERVAL = 5  # Milliseconds between checks for a finished tokenizer job
+    
+    def __init__(self, text_widget, document, language='python'):
         self.text_widget = text_widget
+        self.document = document  # Shadow copy of the text, read instead of the widget
         self.language = language.lower()
+        self.dirty_lines = None  # (first, last) lines touched since the last pass
+        self.line_states = [0, None]  # Lexer state at the start of each line (index = line - 1)
+        self.line_tokens = [None, None]  # Tokens currently tagged on each line (index = line - 1)
+        self.unhighlighted = []  # [first, last] line ranges still waiting for catch-up
+        self.provisional_view = None  # Viewport last highlighted without a known state
+        self.version = 0  # Bumped by every edit so stale tokenizer results can be dropped
+        self.job_reply = None  # Queue the worker answers the job in flight on
+        self.job_info = None
+        self.poll_job = None
+        self.apply_job = None
         self.configure_tags()
         
     def configure_tags(self):
@@ -54,94 +275,456 @@ class SyntaxHighlighter:
         
     def get_keywords(self):
         """Get keywords for current language"""
-        keywords_dict = {
-            'python': ['False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await', 'break', 'class', 
-                      'continue', 'def', 'del', 'elif', 'else', 'except', 'finally', 'for', 'from', 'global',
-                      'if', 'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return',
-                      'try', 'while', 'with', 'yield', 'self', 'print'],
-            'javascript': ['abstract', 'await', 'boolean', 'break', 'case', 'catch', 'class', 'const', 
-                          'continue', 'debugger', 'default', 'delete', 'do', 'else', 'enum', 'export', 
-                          'extends', 'false', 'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
-                          'let', 'new', 'null', 'return', 'static', 'super', 'switch', 'this', 'throw', 
-                          'true', 'try', 'typeof', 'var', 'void', 'while', 'with', 'yield', 'async', 'console'],
-            'java': ['abstract', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'const',
-                    'continue', 'default', 'do', 'double', 'else', 'enum', 'extends', 'final', 'finally', 
-                    'float', 'for', 'if', 'implements', 'import', 'instanceof', 'int', 'interface', 'long',
-                    'new', 'package', 'private', 'protected', 'public', 'return', 'short', 'static', 
-                    'super', 'switch', 'this', 'throw', 'throws', 'try', 'void', 'while'],
-            'cpp': ['auto', 'bool', 'break', 'case', 'catch', 'char', 'class', 'const', 'continue', 
-                   'default', 'delete', 'do', 'double', 'else', 'enum', 'explicit', 'extern', 'false', 
-                   'float', 'for', 'friend', 'if', 'inline', 'int', 'long', 'namespace', 'new', 'nullptr',
-                   'operator', 'private', 'protected', 'public', 'return', 'short', 'signed', 'sizeof',
-                   'static', 'struct', 'switch', 'template', 'this', 'throw', 'true', 'try', 'typedef',
-                   'using', 'virtual', 'void', 'while'],
-            'c': ['auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double', 'else',
-                 'enum', 'extern', 'float', 'for', 'goto', 'if', 'int', 'long', 'register', 'return', 
-                 'short', 'signed', 'sizeof', 'static', 'struct', 'switch', 'typedef', 'union', 
-                 'unsigned', 'void', 'volatile', 'while'],
-        }
-        return keywords_dict.get(self.language, keywords_dict['python'])
+        return Grammar.get(self.language).keywords
+    
+    def mark_dirty(self, first_line, old_last_line, new_last_line):
+        """Record an edit that replaced lines first..old_last with first..new_last"""
+        delta = new_last_line - old_last_line
+        self.version += 1
+        self.provisional_view = None
+        
+        # The state at the start of the first line still holds, the
+        # states of every other line the edit touched are unknown
+        self.line_states[first_line:old_last_line] = [None] * (new_last_line - first_line)
+        self.line_tokens[first_line - 1:old_last_line] = [None] * (new_last_line - first_line + 1)
+        if delta:
+            self.shift_unhighlighted(old_last_line, delta)
+        if self.dirty_lines is None:
+            self.dirty_lines = (first_line, new_last_line)
+            return
+        
+        # Shift the pending range by the lines the new edit added or removed
+        start, end = self.dirty_lines
+        if start > old_last_line:
+            start += delta
+        if end > old_last_line:
+            end += delta
+        self.dirty_lines = (min(start, first_line), max(end, new_last_line))
+    
+    def line_count(self):
+        """Get the number of lines in the text"""
+        return self.document.line_count()
+    
+    def reset(self):
+        """Forget all lexer checkpoints and pending work"""
+        self.cancel_catch_up()
+        self.version += 1
+        self.dirty_lines = None
+        self.provisional_view = None
+        self.line_states = [0] + [None] * self.line_count()
+        self.line_tokens = [None] * len(self.line_states)
     
     def highlight(self, event=None):
-        """Apply syntax highlighting to the text"""
-        # Remove all existing tags
-        for tag in ["keyword", "string", "comment", "number", "function", "class"]:
+        """Re-highlight the whole text, visible lines first"""
+        self.highlight_viewport_first()
+    
+    def highlight_dirty(self):
+        """Re-highlight only the lines touched since the last pass"""
+        if self.dirty_lines is None:
+            return
+        
+        first_line, last_line = self.dirty_lines
+        self.dirty_lines = None
+        self.add_unhighlighted(first_line, min(last_line, self.line_count()))
+        self.dispatch()
+    
+    def highlight_viewport_first(self):
+        """Highlight the visible lines now and the rest of the text in the background"""
+        self.reset()
+        for tag in self.TAGS:
             self.text_widget.tag_remove(tag, "1.0", "end")
         
-        content = self.text_widget.get("1.0", "end-1c")
-        
-        # Highlight keywords
-        keywords = self.get_keywords()
-        for keyword in keywords:
-            pattern = r'\b' + keyword + r'\b'
-            for match in re.finditer(pattern, content):
-                start_idx = f"1.0+{match.start()}c"
-                end_idx = f"1.0+{match.end()}c"
-                self.text_widget.tag_add("keyword", start_idx, end_idx)
-        
-        # Highlight strings
-        for match in re.finditer(r'"[^"\\]*(\\.[^"\\]*)*"', content):
-            start_idx = f"1.0+{match.start()}c"
-            end_idx = f"1.0+{match.end()}c"
-            self.text_widget.tag_add("string", start_idx, end_idx)
-            
-        for match in re.finditer(r"'[^'\\]*(\\.[^'\\]*)*'", content):
-            start_idx = f"1.0+{match.start()}c"
-            end_idx = f"1.0+{match.end()}c"
-            self.text_widget.tag_add("string", start_idx, end_idx)
-        
-        # Highlight comments
-        if self.language in ['python', 'ruby', 'bash']:
-            comment_pattern = r'#[^\n]*'
-        elif self.language in ['javascript', 'java', 'cpp', 'c', 'csharp']:
-            comment_pattern = r'//[^\n]*'
+        self.unhighlighted = [[1, self.line_count()]]
+        self.dispatch()
+    
+    def visible_lines(self):
+        """Get the first and last line shown in the text widget"""
+        first_line = int(self.text_widget.index("@0,0").split('.')[0])
+        height = self.text_widget.winfo_height()
+        if height > 1:
+            last_line = int(self.text_widget.index(f"@0,{height}").split('.')[0])
         else:
-            comment_pattern = r'#[^\n]*'
-            
-        for match in re.finditer(comment_pattern, content):
-            start_idx = f"1.0+{match.start()}c"
-            end_idx = f"1.0+{match.end()}c"
-            self.text_widget.tag_add("comment", start_idx, end_idx)
+            # Not mapped yet, so assume the configured height in lines
+            last_line = first_line + int(self.text_widget.cget("height"))
+        return first_line, last_line
+    
+    def highlight_visible(self):
+        """Bring pending lines inside the viewport to the front of the queue"""
+        if self.unhighlighted:
+            self.dispatch()
+    
+    def nearest_checkpoint(self, line):
+        """Find the closest line at or above line whose start state is known"""
+        states = self.line_states
+        for candidate in range(line, max(0, line - self.RESTART_LINES), -1):
+            if states[candidate - 1] is not None:
+                return candidate
+        return None
+    
+    def dispatch(self):
+        """Send the next pending lines to the tokenizer worker.
+        
+        Only one job per editor is in flight at a time; each job carries
+        the document version so results overtaken by an edit are dropped.
+        Lines stay pending until their tags have actually been applied.
+        """
+        if self.job_reply is not None or self.apply_job is not None:
+            return
+        
+        # Lines past the end of the text may still be pending after deletions
+        line_count = self.line_count()
+        self.discard_unhighlighted(line_count + 1, sys.maxsize)
+        if not self.unhighlighted:
+            return
+        
+        first_visible, last_visible = self.visible_lines()
+        view_start = next((max(r[0], first_visible) for r in self.unhighlighted
+                           if r[1] >= first_visible and r[0] <= last_visible), None)
+        if (view_start is not None and self.nearest_checkpoint(view_start) is None
+                and self.provisional_view != (first_visible, last_visible)):
+            # No state to resume from near the viewport: guess the default
+            # state for now, the catch-up will correct it when it gets there
+            self.provisional_view = (first_visible, last_visible)
+            first_line, last_line = view_start, min(last_visible, line_count)
+            state, settle_from, record = 0, None, False
+        else:
+            start = self.next_catch_up_line()
+            end = next(r[1] for r in self.unhighlighted if r[0] <= start <= r[1])
+            first_line = self.nearest_checkpoint(start) or 1
+            last_line = min(end, start + self.CHUNK_LINES - 1, line_count)
+            state, settle_from, record = self.line_states[first_line - 1], last_line, True
+            # Lex a little further in case the state has not settled by last_line
+            last_line = min(last_line + self.SPILL_LINES, line_count)
+        
+        states = self.line_states
+        if len(states) <= last_line:
+            states.extend([None] * (last_line + 1 - len(states)))
+            self.line_tokens.extend([None] * (len(states) - len(self.line_tokens)))
+        job = functools.partial(
+            self.lex_snapshot, self.get_tokenizer(), self.document.snapshot(), first_line, last_line, state,
+            states[first_line:last_line + 1] if record else None,
+            None if settle_from is None else settle_from - first_line
+        )
+        self.job_reply = queue.Queue()
+        TokenizerWorker.get().submit(job, self.job_reply)
+        self.job_info = (self.version, first_line, line_count)
+        self.poll_job = self.text_widget.after(self.POLL_INTERVAL, self.poll_result)
+    
+    @staticmethod
+    def lex_snapshot(tokenizer, snapshot, first_line, last_line, *args):
+        """Worker side of a job: read the lines from a document snapshot and lex them"""
+        return tokenizer.lex_lines(snapshot.get_lines(first_line, last_line), *args)
+    
+    def poll_result(self):
+        """Check whether the worker has finished the job in flight"""
+        self.poll_job = None
+        try:
+            result = self.job_reply.get_nowait()
+        except queue.Empty:
+            self.poll_job = self.text_widget.after(self.POLL_INTERVAL, self.poll_result)
+            return
         
-        # Highlight numbers
-        for match in re.finditer(r'\b\d+\.?\d*\b', content):
-            start_idx = f"1.0+{match.start()}c"
-            end_idx = f"1.0+{match.end()}c"
-            self.text_widget.tag_add("number", start_idx, end_idx)
+        self.job_reply = None
+        if isinstance(result, Exception):
+            raise result
+        version, first_line, line_count = self.job_info
+        if version != self.version:
+            # Superseded by an edit; the lines are still pending
+            self.dispatch()
+            return
+        
+        lexed, tokens, line_ends, end_states, settled = result
+        last_line = first_line + lexed - 1
+        if end_states is not None:
+            self.line_states[first_line:last_line + 1] = end_states
+            if not settled and last_line < line_count:
+                # The state change runs on past this job, keep going later
+                self.add_unhighlighted(last_line + 1, last_line + 1)
+        self.apply_tokens(version, first_line, first_line, last_line, tokens, line_ends, end_states is not None)
+    
+    def apply_tokens(self, version, job_line, line, last_line, tokens, line_ends, record):
+        """Apply a job's tokens in batches of whole lines, one batch per event loop turn"""
+        self.apply_job = None
+        if version != self.version:
+            # An edit arrived between batches, the rest is lexed again
+            self.dispatch()
+            return
+        
+        # Grow the batch line by line until it holds enough tokens
+        batch_end = line
+        first_token = line_ends[line - job_line - 1] if line > job_line else 0
+        while batch_end < last_line and line_ends[batch_end - job_line] - first_token < self.APPLY_TOKENS:
+            batch_end += 1
+        
+        # Only touch lines whose tokens differ from what is already applied,
+        # and give Tk all ranges of a tag in a single tag_add call
+        applied = self.line_tokens
+        changed = []  # [first, last] runs of changed lines
+        ranges = [[] for _ in self.TAGS]
+        token = first_token
+        for batch_line in range(line, batch_end + 1):
+            next_token = line_ends[batch_line - job_line]
+            line_tokens = tokens[token * 3:next_token * 3]
+            token = next_token
+            if applied[batch_line - 1] == line_tokens:
+                continue
+            applied[batch_line - 1] = line_tokens
+            if changed and changed[-1][1] == batch_line - 1:
+                changed[-1][1] = batch_line
+            else:
+                changed.append([batch_line, batch_line])
+            for i in range(0, len(line_tokens), 3):
+                ranges[line_tokens[i]] += (f"{batch_line}.{line_tokens[i + 1]}", f"{batch_line}.{line_tokens[i + 2]}")
+        
+        widget = self.text_widget
+        for first, last in changed:
+            for tag in self.TAGS:
+                widget.tag_remove(tag, f"{first}.0", f"{last}.end")
+        for tag, indices in zip(self.TAGS, ranges):
+            if indices:
+                widget.tag_add(tag, *indices)
+        if record:
+            self.discard_unhighlighted(line, batch_end)
+        
+        if batch_end < last_line:
+            self.apply_job = widget.after(1, lambda: self.apply_tokens(
+                version, job_line, batch_end + 1, last_line, tokens, line_ends, record))
+        else:
+            self.dispatch()
+    
+    def cancel_catch_up(self):
+        """Stop the background catch-up and forget pending lines"""
+        for job in (self.poll_job, self.apply_job):
+            if job is not None:
+                self.text_widget.after_cancel(job)
+        self.poll_job = self.apply_job = self.job_reply = None
+        self.unhighlighted = []
+    
+    def next_catch_up_line(self):
+        """Pick the pending line to lex next.
+        
+        Lines from the top of the viewport downwards come first, but only
+        where lexing can resume from a known state; the start of the first
+        pending range always can, as everything above it has been lexed.
+        """
+        first_visible = self.visible_lines()[0]
+        for start, end in self.unhighlighted:
+            if end >= first_visible:
+                candidate = max(start, first_visible)
+                if self.nearest_checkpoint(candidate) is not None:
+                    return candidate
+        return self.unhighlighted[0][0]
+    
+    def add_unhighlighted(self, first_line, last_line):
+        """Add a line range to the pending ranges"""
+        merged = []
+        for start, end in sorted(self.unhighlighted + [[first_line, last_line]]):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.unhighlighted = merged
+    
+    def discard_unhighlighted(self, first_line, last_line):
+        """Remove a highlighted line range from the pending ranges"""
+        remaining = []
+        for start, end in self.unhighlighted:
+            if end < first_line or start > last_line:
+                remaining.append([start, end])
+                continue
+            if start < first_line:
+                remaining.append([start, first_line - 1])
+            if end > last_line:
+                remaining.append([last_line + 1, end])
+        self.unhighlighted = remaining
+    
+    def shift_unhighlighted(self, after_line, delta):
+        """Move pending ranges below an edit by the number of lines it added"""
+        new_last_line = after_line + delta
+        for line_range in self.unhighlighted:
+            for i in (0, 1):
+                if line_range[i] > after_line:
+                    line_range[i] += delta
+                else:
+                    # Lines the edit removed collapse onto its last line
+                    line_range[i] = min(line_range[i], new_last_line)
+    
+    def get_tokenizer(self):
+        """Get the compiled tokenizer for current language"""
+        return Grammar.get(self.language).tokenizer
+
+
+class Grammar:
+    """One language's highlighting rules, compiled on first use and shared by all editors"""
+    
+    cache = {}  # Compiled grammars by language
+    
+    def __init__(self, keywords, builtins='', line_comment=None, multiline=(), ignore_case=False):
+        self.keywords = keywords.split()
+        self.builtins = builtins.split()
+        self.names = frozenset(self.keywords + self.builtins)
+        self.line_comment = line_comment
+        self.multiline_rules = list(multiline)
+        self.tokenizer = Tokenizer(self.keywords, line_comment, self.multiline_rules, ignore_case)
+        self.completions = None
+        
+    def get_completions(self):
+        """Get the prefix index of the language's keywords and builtins, building it the first time"""
+        if self.completions is None:
+            self.completions = PrefixIndex(self.keywords + self.builtins)
+        return self.completions
+    
+    @classmethod
+    def get(cls, language):
+        """Get the compiled grammar for a language, building it the first time"""
+        grammar = cls.cache.get(language)
+        if grammar is None:
+            if language in GRAMMARS:
+                grammar = cls(**GRAMMARS[language])
+            else:
+                # Unknown languages share the Python grammar, as before
+                grammar = cls.get('python')
+            cls.cache[language] = grammar
+        return grammar
+
+
+class Tokenizer:
+    """Single-pass, resumable line tokenizer compiled from one language's rules"""
+    
+    TAG_INDEX = {tag: i for i, tag in enumerate(SyntaxHighlighter.TAGS)}
+    
+    def __init__(self, keywords, comment_pattern, multiline_rules=(), ignore_case=False):
+        # Longest keywords first so full words are tried before their prefixes
+        keyword_alternation = '|'.join(sorted(map(re.escape, keywords), key=len, reverse=True))
+        if ignore_case:
+            keyword_alternation = '(?i:' + keyword_alternation + ')'
+        
+        # Lexer states for constructs that can span lines: state -> (tag, closing pattern)
+        self.continuations = {}
+        rules = []
+        for state, tag, opening, closing in multiline_rules:
+            self.continuations[state] = (tag, re.compile(closing))
+            rules.append((state, opening))
+        
+        # Order matters: at any position the first matching rule wins
+        if comment_pattern:
+            rules.append(("comment", comment_pattern))
+        rules += [
+            ("string", r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\''),
+            ("function", r'\b\w+(?=\()'),
+            ("keyword", r'\b(?:' + keyword_alternation + r')\b'),
+            ("number", r'\b\d+\.?\d*\b'),
+            ("identifier", r'\w+'),  # Consumed whole so keywords never match inside names
+        ]
+        self.pattern = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in rules))
+        
+    def lex_line(self, line, state=0):
+        """Lex one line starting in the given state.
+        
+        Returns ([(tag, start, end), ...], state at the end of the line).
+        """
+        tokens = []
+        pos = 0
+        if state:
+            tag, closing = self.continuations[state]
+            match = closing.match(line)
+            if match is None:
+                if line:
+                    tokens.append((tag, 0, len(line)))
+                return tokens, state
+            tokens.append((tag, 0, match.end()))
+            pos = match.end()
+        
+        search = self.pattern.search
+        match = search(line, pos)
+        while match:
+            name = match.lastgroup
+            if name in self.continuations:
+                # Opening of a multi-line construct, look for its end on this line
+                tag, closing = self.continuations[name]
+                close = closing.match(line, match.end())
+                if close is None:
+                    tokens.append((tag, match.start(), len(line)))
+                    return tokens, name
+                tokens.append((tag, match.start(), close.end()))
+                pos = close.end()
+            else:
+                if name != "identifier":
+                    tokens.append((name, match.start(), match.end()))
+                pos = match.end()
+            match = search(line, pos)
+        return tokens, 0
+    
+    def lex_lines(self, text, state=0, cached_states=None, settle_from=None):
+        """Lex consecutive lines in one go; safe to run off the Tk thread.
+        
+        Returns (lines lexed, tokens, line_ends, end_states, settled) where
+        tokens is a flat array of (tag index, start column, end column)
+        triples and line_ends[i] counts the tokens up to and including
+        line i, so a line's tokens do not depend on its line number.
+        Given cached_states (the known end state of each line), end_states
+        lists the new ones and lexing stops at the first line from index
+        settle_from on whose end state matches the cached one.
+        """
+        tokens = array('i')
+        line_ends = array('i')
+        end_states = None if cached_states is None else []
+        tag_index = self.TAG_INDEX
+        settled = False
+        lexed = 0
+        for line_text in text.split('\n'):
+            line_tokens, state = self.lex_line(line_text, state)
+            for tag, start, end in line_tokens:
+                tokens.extend((tag_index[tag], start, end))
+            line_ends.append(len(tokens) // 3)
+            if end_states is not None:
+                end_states.append(state)
+                settled = lexed >= settle_from and cached_states[lexed] == state
+            lexed += 1
+            if settled:
+                break
+        return lexed, tokens, line_ends, end_states, settled
+
+
+class TokenizerWorker:
+    """Background thread that runs tokenizer jobs for every editor"""
+    
+    instance = None
+    
+    def __init__(self):
+        self.jobs = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+        
+    @classmethod
+    def get(cls):
+        """Get the shared worker, starting it on first use"""
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+    
+    def submit(self, job, reply):
+        """Queue a callable; its result (or exception) is put on reply"""
+        self.jobs.put((job, reply))
         
-        # Highlight functions
-        for match in re.finditer(r'\b\w+(?=\()', content):
-            start_idx = f"1.0+{match.start()}c"
-            end_idx = f"1.0+{match.end()}c"
-            self.text_widget.tag_add("function", start_idx, end_idx)
+    def run(self):
+        """Run jobs in order, forever"""
+        while True:
+            job, reply = self.jobs.get()
+            try:
+                reply.put(job())
+            except Exception as e:
+                reply.put(e)
 
 
 class AutocompletePopup(tk.Toplevel):
-    """Autocomplete popup window"""
+    """Autocomplete popup window, shared by every editor in a top-level window"""
+    
+    instances = {}  # Popups by the path of their top-level window
+    MAX_ROWS = 15
     
-    def __init__(self, parent, text_widget):
+    def __init__(self, parent):
         super().__init__(parent)
-        self.text_widget = text_widget
+        self.text_widget = None  # Editor text the popup is currently completing in
         self.withdraw()  # Hide initially
         self.overrideredirect(True)  # Remove window decorations
         
@@ -168,42 +751,80 @@ class AutocompletePopup(tk.Toplevel):
         self.listbox.bind("<Double-Button-1>", lambda e: self.insert_selection())
         self.listbox.bind("<Return>", lambda e: self.insert_selection())
         
-        self.suggestions = []
+        self.suggestions = []  # Rows currently in the listbox
         self.current_word = ""
+        self.position = None  # Screen position last given to geometry()
+        self.visible = False
+        
+    @classmethod
+    def shared(cls, widget):
+        """Get the popup for the top-level window holding widget, creating it once"""
+        root = widget.winfo_toplevel()
+        popup = cls.instances.get(str(root))
+        if popup is None or not popup.winfo_exists():
+            popup = cls(root)
+            cls.instances[str(root)] = popup
+        return popup
+    
+    def showing(self, text_widget):
+        """Check whether the popup is open for text_widget"""
+        return self.visible and self.text_widget is text_widget
         
-    def show_suggestions(self, suggestions, word, x, y):
-        """Show autocomplete suggestions"""
+    def show_suggestions(self, text_widget, suggestions, word, x, y):
+        """Show autocomplete suggestions, touching only the rows and geometry that changed"""
         if not suggestions:
             self.hide()
             return
-            
-        self.suggestions = suggestions
-        self.current_word = word
         
-        # Clear and populate listbox
-        self.listbox.delete(0, tk.END)
-        for suggestion in suggestions[:15]:  # Limit to 15 suggestions
-            self.listbox.insert(tk.END, suggestion)
+        self.text_widget = text_widget
+        self.current_word = word
         
-        # Select first item
-        if self.listbox.size() > 0:
+        suggestions = suggestions[:self.MAX_ROWS]
+        if suggestions != self.suggestions:
+            self.replace_rows(suggestions)
+            
+            # Select first item
+            self.listbox.selection_clear(0, tk.END)
             self.listbox.selection_set(0)
             self.listbox.activate(0)
+            self.listbox.see(0)
         
         # Position near cursor
-        self.geometry(f"+{x}+{y}")
-        self.deiconify()
-        self.lift()
+        if (x, y) != self.position:
+            self.geometry(f"+{x}+{y}")
+            self.position = (x, y)
+        if not self.visible:
+            self.deiconify()
+            self.lift()
+            self.visible = True
+    
+    def replace_rows(self, suggestions):
+        """Swap in new rows, keeping the unchanged ones at the top and bottom"""
+        old = self.suggestions
+        limit = min(len(old), len(suggestions))
+        head = 0
+        while head < limit and old[head] == suggestions[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and old[-1 - tail] == suggestions[-1 - tail]:
+            tail += 1
+        if head < len(old) - tail:
+            self.listbox.delete(head, len(old) - tail - 1)
+        if head < len(suggestions) - tail:
+            self.listbox.insert(head, *suggestions[head:len(suggestions) - tail])
+        self.suggestions = suggestions
         
     def hide(self):
         """Hide autocomplete popup"""
-        self.withdraw()
+        if self.visible:
+            self.withdraw()
+            self.visible = False
         
     def insert_selection(self):
         """Insert selected suggestion"""
         selection = self.listbox.curselection()
         if selection:
-            selected = self.listbox.get(selection[0])
+            selected = self.suggestions[selection[0]]
             
             # Remove the partial word
             self.text_widget.delete(f"insert-{len(self.current_word)}c", "insert")
@@ -236,35 +857,1844 @@ class AutocompletePopup(tk.Toplevel):
 
 
 class LineNumbers(tk.Canvas):
-    """Line numbers widget"""
+    """Line numbers widget.
+    
+    Keeps one canvas text item per visible row and only moves or
+    re-labels the ones whose position or number changed, so scrolling
+    and typing never delete and recreate items.
+    """
+    
+    FONT = ("Consolas", 10)
+    MIN_DIGITS = 2
+    PADDING = 14  # Pixels around the digits
+    
+    def __init__(self, parent, text_widget, **kwargs):
+        super().__init__(parent, width=50, bg="#2b2b2b", highlightthickness=0, **kwargs)
+        self.text_widget = text_widget
+        self.digit_width = tkfont.Font(font=self.FONT).measure("0")
+        self.items = []  # Canvas text item ids, reused from redraw to redraw
+        self.rows = []  # (x, y, label) each item shows
+        self.shown = None  # View the rows were last drawn for
+        self.digits = 0
+        self.line_offset = 0  # Added to every number, for views that start partway into a file
+        
+    def redraw(self, *args):
+        """Redraw line numbers if the view or the line count changed"""
+        text_widget = self.text_widget
+        first = text_widget.index("@0,0")
+        dline = text_widget.dlineinfo(first)
+        line_count = int(text_widget.index("end-1c").split(".")[0])
+        line_count += self.line_offset
+        view = (first, dline and dline[1], line_count, text_widget.winfo_height(), self.line_offset)
+        if view == self.shown:
+            return
+        self.shown = view
+        
+        # Wide enough for the largest line number
+        digits = max(self.MIN_DIGITS, len(str(line_count)))
+        if digits != self.digits:
+            self.digits = digits
+            self.configure(width=digits * self.digit_width + self.PADDING)
+        x = digits * self.digit_width + self.PADDING // 2
+        
+        rows = []
+        i = first
+        while dline is not None:
+            rows.append((x, dline[1], str(int(i.split(".")[0]) + self.line_offset)))
+            i = text_widget.index(f"{i}+1line")
+            dline = text_widget.dlineinfo(i)
+        
+        while len(self.items) < len(rows):
+            self.items.append(self.create_text(x, 0, anchor="ne", text="", fill="#858585", font=self.FONT))
+            self.rows.append((x, 0, ""))
+        for n, item in enumerate(self.items):
+            row = rows[n] if n < len(rows) else (x, 0, "")  # Rows below the text stay blank
+            old = self.rows[n]
+            if row == old:
+                continue
+            if row[:2] != old[:2]:
+                self.coords(item, row[0], row[1])
+            if row[2] != old[2]:
+                self.itemconfigure(item, text=row[2])
+            self.rows[n] = row
+
+
+class EditScheduler:
+    """Coalesces editor work so each stale job runs at most once per idle cycle"""
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.jobs = {}  # name -> (callback, debounce in ms)
+        self.pending = {}  # name -> Tk after id
+        
+    def add_job(self, name, callback, delay=0):
+        """Register a job; delay > 0 debounces it by that many milliseconds"""
+        self.jobs[name] = (callback, delay)
+        
+    def mark_stale(self, name):
+        """Request a run of a job, merging with any run already queued"""
+        callback, delay = self.jobs[name]
+        if name in self.pending:
+            if not delay:
+                return
+            # Debounced jobs wait until the input has been quiet for delay ms
+            self.widget.after_cancel(self.pending[name])
+        if delay:
+            self.pending[name] = self.widget.after(delay, lambda: self.run(name))
+        else:
+            self.pending[name] = self.widget.after_idle(lambda: self.run(name))
+            
+    def cancel(self, name):
+        """Drop a queued run of a job"""
+        after_id = self.pending.pop(name, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+            
+    def run(self, name):
+        """Run a job now if it is queued"""
+        if self.pending.pop(name, None) is not None:
+            self.jobs[name][0]()
+
+
+class UndoJournal:
+    """Editor-managed undo history with coalescing and a memory cap.
+    
+    Each group is a list of [offset, removed, inserted] records undone
+    together. Edits made while handling one Tk event share a group, and
+    consecutive typing or deleting is merged into word and line sized
+    groups. When the history holds more than MAX_CHARS characters the
+    oldest half is compressed into a temporary file and read back only
+    if undo reaches it.
+    """
+    
+    MAX_CHARS = 2 * 1024 * 1024  # Characters of history kept in memory per editor
+    COALESCE_SECONDS = 2.0  # Longer pauses in typing start a new group
+    WORD_PATTERN = re.compile(r'\w')
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.undo_stack = []  # Groups, oldest first
+        self.redo_stack = []
+        self.chars = 0  # Characters held by undo_stack
+        self.spill_file = None  # Temporary file of compressed older groups
+        self.spilled = []  # (file position, length) of each spilled batch, oldest first
+        self.paused = False  # Edits are not recorded, e.g. while undoing or loading a file
+        self.in_event = False  # An edit was recorded during the current Tk event
+        self.last_time = 0.0
+        
+    def record(self, offset, removed, inserted):
+        """Add an edit that replaced removed at offset with inserted"""
+        if self.paused or (not removed and not inserted):
+            return
+        self.redo_stack = []
+        now = time.monotonic()
+        if self.undo_stack and (self.in_event or now - self.last_time < self.COALESCE_SECONDS):
+            group = self.undo_stack[-1]
+            if self.merge(group[-1], offset, removed, inserted):
+                pass
+            elif self.in_event:
+                group.append([offset, removed, inserted])
+            else:
+                self.undo_stack.append([[offset, removed, inserted]])
+        else:
+            self.undo_stack.append([[offset, removed, inserted]])
+        self.last_time = now
+        self.chars += len(removed) + len(inserted)
+        if not self.in_event:
+            self.in_event = True
+            self.widget.after_idle(self.end_event)
+        if self.chars > self.MAX_CHARS:
+            self.spill()
+            
+    def merge(self, last, offset, removed, inserted):
+        """Extend the last record with one typed or deleted character if they belong together"""
+        last_offset, last_removed, last_inserted = last
+        if inserted and not removed and not last_removed and len(inserted) == 1:
+            # Typing; a new word or line starts a new group
+            if offset != last_offset + len(last_inserted) or inserted == '\n':
+                return False
+            if (self.WORD_PATTERN.match(inserted) and not self.in_event
+                    and not self.WORD_PATTERN.match(last_inserted[-1])):
+                return False
+            last[2] = last_inserted + inserted
+            return True
+        if removed and not inserted and not last_inserted and len(removed) == 1 and removed != '\n':
+            if offset + 1 == last_offset:  # Backspace
+                last[0], last[1] = offset, removed + last_removed
+                return True
+            if offset == last_offset:  # Delete
+                last[1] = last_removed + removed
+                return True
+        return False
+    
+    def end_event(self):
+        self.in_event = False
+        
+    def separator(self):
+        """Make the next edit start a new group"""
+        self.last_time = 0.0
+        self.in_event = False
+        
+    def can_undo(self):
+        return bool(self.undo_stack or self.spilled)
+    
+    def can_redo(self):
+        return bool(self.redo_stack)
+    
+    def pop_undo(self):
+        """Take the newest group to undo, reading spilled history back if needed"""
+        self.separator()
+        if not self.undo_stack and self.spilled:
+            self.unspill()
+        if not self.undo_stack:
+            return None
+        group = self.undo_stack.pop()
+        self.chars -= sum(len(removed) + len(inserted) for _, removed, inserted in group)
+        self.redo_stack.append(group)
+        return group
+    
+    def pop_redo(self):
+        """Take the newest undone group to do again"""
+        self.separator()
+        if not self.redo_stack:
+            return None
+        group = self.redo_stack.pop()
+        self.undo_stack.append(group)
+        self.chars += sum(len(removed) + len(inserted) for _, removed, inserted in group)
+        return group
+    
+    def clear(self):
+        """Forget all history"""
+        self.undo_stack = []
+        self.redo_stack = []
+        self.chars = 0
+        self.spilled = []
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+        self.separator()
+        
+    def spill(self):
+        """Move the oldest half of the in-memory history to the spill file"""
+        count = chars = 0
+        while count < len(self.undo_stack) - 1 and chars < self.chars // 2:
+            chars += sum(len(removed) + len(inserted) for _, removed, inserted in self.undo_stack[count])
+            count += 1
+        if not count:
+            return
+        data = zlib.compress(json.dumps(self.undo_stack[:count]).encode('utf-8', 'surrogatepass'), 1)
+        try:
+            if self.spill_file is None:
+                self.spill_file = tempfile.TemporaryFile(prefix="ide_ctk_undo_")
+            self.spill_file.seek(0, os.SEEK_END)
+            position = self.spill_file.tell()
+            self.spill_file.write(data)
+        except OSError:
+            return  # Keep the history in memory if it cannot go to disk
+        self.spilled.append((position, len(data)))
+        del self.undo_stack[:count]
+        self.chars -= chars
+        
+    def unspill(self):
+        """Read the newest spilled batch back into memory"""
+        position, length = self.spilled.pop()
+        self.spill_file.seek(position)
+        groups = json.loads(zlib.decompress(self.spill_file.read(length)).decode('utf-8', 'surrogatepass'))
+        self.spill_file.truncate(position)
+        self.undo_stack = groups + self.undo_stack
+        self.chars += sum(len(removed) + len(inserted) for group in groups for _, removed, inserted in group)
+
+
+class Document:
+    """Piece table mirror of an editor's text, kept in sync by the edit hook.
+    
+    Pieces are (source, start, end, newlines) slices of immutable
+    strings, so a copy of the piece list is a snapshot that later edits
+    cannot change and that other threads may read.
+    """
+    
+    MAX_PIECES = 1024  # Pieces kept before the table is compacted into one string
+    RUN_LENGTH = 4096  # Longest run of typing appended to one source string
+    
+    def __init__(self, text='', version=0):
+        self.newlines = {}  # id(source) -> (source, newline offsets) for long sources
+        self.pieces = [self.piece(text, 0, len(text))] if text else []
+        self.version = version  # Bumped by every edit
+        self.piece_offsets = None  # Text offset where each piece starts, plus the length
+        self.piece_lines = None  # Newlines before each piece, plus the total
+        self.last_insert = None  # Source of the latest insert, which typing may extend
+        
+    def snapshot(self):
+        """Get a read-only copy of the current text"""
+        copy = Document(version=self.version)
+        copy.pieces = list(self.pieces)
+        copy.newlines = self.newlines
+        return copy
+    
+    def load(self, text):
+        """Replace the whole text"""
+        self.__init__(text, self.version + 1)
+        
+    def text(self):
+        """Get the whole text"""
+        return ''.join(source[start:end] for source, start, end, _ in self.pieces)
+    
+    def length(self):
+        """Get the number of characters in the text"""
+        return self.index()[0][-1]
+    
+    def line_count(self):
+        """Get the number of lines in the text"""
+        return self.index()[1][-1] + 1
+    
+    def index(self):
+        """Get (piece offsets, piece lines), rebuilding them after an edit"""
+        if self.piece_offsets is None:
+            offsets, lines = [0], [0]
+            for _, start, end, newlines in self.pieces:
+                offsets.append(offsets[-1] + end - start)
+                lines.append(lines[-1] + newlines)
+            self.piece_offsets, self.piece_lines = offsets, lines
+        return self.piece_offsets, self.piece_lines
+    
+    def newline_offsets(self, source):
+        """Get where every newline in a long source string is, computed once per source"""
+        entry = self.newlines.get(id(source))
+        if entry is None or entry[0] is not source:
+            offsets = array('q')
+            position = -1
+            for part in source.split('\n')[:-1]:
+                position += len(part) + 1
+                offsets.append(position)
+            entry = (source, offsets)
+            self.newlines[id(source)] = entry
+        return entry[1]
+    
+    def piece(self, source, start, end):
+        """Make a piece for source[start:end]"""
+        return (source, start, end, self.count_newlines(source, start, end))
+    
+    def count_newlines(self, source, start, end):
+        """Count the newlines in source[start:end]"""
+        if len(source) <= self.RUN_LENGTH or end - start == len(source):
+            return source.count('\n', start, end)
+        offsets = self.newline_offsets(source)
+        return bisect_left(offsets, end) - bisect_left(offsets, start)
+    
+    def nth_newline(self, source, start, n):
+        """Get the position in source of the nth newline from start on"""
+        if len(source) <= self.RUN_LENGTH:
+            position = start - 1
+            for _ in range(n):
+                position = source.index('\n', position + 1)
+            return position
+        offsets = self.newline_offsets(source)
+        return offsets[bisect_left(offsets, start) + n - 1]
+    
+    def line_start(self, line):
+        """Get the offset where a line starts (lines count from 1)"""
+        offsets, lines = self.index()
+        newlines = line - 1
+        if newlines <= 0:
+            return 0
+        if newlines > lines[-1]:
+            return offsets[-1]
+        i = bisect_left(lines, newlines) - 1  # Piece holding that newline
+        source, start, _, _ = self.pieces[i]
+        return offsets[i] + self.nth_newline(source, start, newlines - lines[i]) - start + 1
+    
+    def offset(self, line, column):
+        """Convert a line and column to an offset"""
+        return self.line_start(line) + column
+    
+    def position(self, offset):
+        """Convert an offset to a line and column"""
+        offsets, lines = self.index()
+        if not self.pieces:
+            return 1, 0
+        i = min(bisect_right(offsets, offset) - 1, len(self.pieces) - 1)
+        source, start, _, _ = self.pieces[i]
+        line = lines[i] + self.count_newlines(source, start, start + offset - offsets[i]) + 1
+        return line, offset - self.line_start(line)
+    
+    def get(self, start, end):
+        """Get the text between two offsets"""
+        offsets, _ = self.index()
+        parts = []
+        i = max(bisect_right(offsets, start) - 1, 0)
+        while i < len(self.pieces) and offsets[i] < end:
+            source, piece_start, piece_end, _ = self.pieces[i]
+            parts.append(source[piece_start + max(start - offsets[i], 0):
+                                piece_start + min(end - offsets[i], piece_end - piece_start)])
+            i += 1
+        return ''.join(parts)
+    
+    def get_lines(self, first_line, last_line):
+        """Get lines first..last without the final newline, like Text.get("first.0", "last.end")"""
+        if last_line < self.line_count():
+            end = self.line_start(last_line + 1) - 1
+        else:
+            end = self.length()
+        return self.get(self.line_start(first_line), end)
+    
+    def get_line(self, line):
+        """Get one line without its newline"""
+        return self.get_lines(line, line)
+    
+    def replace(self, start, end, text):
+        """Replace the text between two offsets"""
+        if end > start:
+            self.delete(start, end)
+        if text:
+            self.insert(start, text)
+            
+    def insert(self, offset, text):
+        """Insert text at an offset"""
+        offsets, _ = self.index()
+        i = bisect_right(offsets, offset) - 1
+        pieces = self.pieces
+        if offset == offsets[i]:
+            previous = pieces[i - 1] if i else None
+            if (previous is not None and previous[0] is self.last_insert and previous[2] == len(previous[0])
+                    and len(previous[0]) + len(text) <= self.RUN_LENGTH):
+                # Typing straight on from the last insert extends its piece
+                source = previous[0] + text
+                pieces[i - 1] = (source, previous[1], len(source), previous[3] + text.count('\n'))
+            else:
+                source = text
+                pieces.insert(i, self.piece(source, 0, len(source)))
+        else:
+            source = text
+            piece_source, start, end, newlines = pieces[i]
+            split = start + offset - offsets[i]
+            before = self.piece(piece_source, start, split)
+            pieces[i:i + 1] = [before, self.piece(source, 0, len(source)),
+                               (piece_source, split, end, newlines - before[3])]
+        self.last_insert = source
+        self.edited()
+        
+    def delete(self, start, end):
+        """Delete the text between two offsets"""
+        if end <= start:
+            return
+        offsets, _ = self.index()
+        first = bisect_right(offsets, start) - 1
+        last = bisect_left(offsets, end) - 1  # Last piece starting before end
+        kept = []
+        source, piece_start, piece_end, _ = self.pieces[first]
+        if start > offsets[first]:
+            kept.append(self.piece(source, piece_start, piece_start + start - offsets[first]))
+        source, piece_start, piece_end, _ = self.pieces[last]
+        if end < offsets[last + 1]:
+            kept.append(self.piece(source, piece_start + end - offsets[last], piece_end))
+        self.pieces[first:last + 1] = kept
+        self.edited()
+        
+    def edited(self):
+        """Invalidate the piece index and compact the table when it grows long"""
+        self.version += 1
+        self.piece_offsets = self.piece_lines = None
+        if len(self.pieces) > self.MAX_PIECES:
+            text = self.text()
+            self.newlines = {}  # Snapshots keep their own reference to the old cache
+            self.pieces = [self.piece(text, 0, len(text))]
+            self.last_insert = None
+
+
+class PrefixIndex:
+    """Case-insensitive sorted word list that answers prefix queries with bisect"""
+    
+    BULK_ADD = 64  # Adding more words than this at once re-sorts instead of inserting each
+    
+    def __init__(self, words=()):
+        self.entries = sorted((word.lower(), word) for word in set(words))
+        
+    def __len__(self):
+        return len(self.entries)
+    
+    def add(self, words):
+        """Add words that are not in the index yet"""
+        if len(words) > self.BULK_ADD:
+            self.entries.extend((word.lower(), word) for word in words)
+            self.entries.sort()
+        else:
+            for word in words:
+                insort(self.entries, (word.lower(), word))
+                
+    def remove(self, word):
+        """Remove a word from the index"""
+        entry = (word.lower(), word)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+            
+    def prefixed(self, prefix, limit=None):
+        """Get the words starting with prefix, ignoring case, in sorted order"""
+        folded = prefix.lower()
+        entries = self.entries
+        first = bisect_left(entries, (folded,))
+        last = bisect_left(entries, (folded + chr(sys.maxunicode),), first)
+        if limit is not None:
+            last = min(last, first + limit)
+        return [word for _, word in entries[first:last]]
+    
+    def iter_prefixed(self, prefix):
+        """Yield the words starting with prefix like prefixed, reading the index only as far as asked"""
+        folded = prefix.lower()
+        entries = self.entries
+        for i in range(bisect_left(entries, (folded,)), len(entries)):
+            lowered, word = entries[i]
+            if not lowered.startswith(folded):
+                return
+            yield word
+
+
+class FuzzyMatcher:
+    """Scores a typed abbreviation against names as a subsequence (gEBI -> getElementById)"""
+    
+    # Word starts: the first character, a capital after a lowercase letter or digit, or after _ and $
+    BOUNDARY_PATTERN = re.compile(r'^.|(?<=[a-z0-9])[A-Z]|(?<=[_$])[^_$]')
+    CHECK_EVERY = 16  # Names scored between looks at the clock
+    
+    def __init__(self, query):
+        self.query = query
+        self.folded = query.lower()
+        
+    def score(self, name):
+        """Rate how well the query abbreviates name from 0 to 1, or None if it does not"""
+        if len(name) < len(self.query):
+            return None
+        lowered = name.lower()
+        # Cheap rejection, linear in the name, before the scoring loop runs
+        if not self.fits(lowered, 0, 0):
+            return None
+        starts = [m.start() for m in self.BOUNDARY_PATTERN.finditer(name)]
+        points = 0
+        position = 0
+        previous = -2
+        for i, char in enumerate(self.folded):
+            found = lowered.find(char, position)
+            # Prefer a later word start with the same letter if the rest still fits after it
+            for start in starts:
+                if start >= position and lowered[start] == char:
+                    if start != found and self.fits(lowered, start + 1, i + 1):
+                        found = start
+                    break
+            if found < 0:
+                return None
+            points += 1
+            if found in starts:
+                points += 2
+            if found == previous + 1:
+                points += 1
+            previous = found
+            position = found + 1
+        # Shorter names win among equally good matches
+        return max(0.0, points / (4 * len(self.folded)) - 0.01 * (len(name) - len(self.query)))
+    
+    def fits(self, lowered, position, query_index):
+        """Check that the rest of the query is still a subsequence from position on"""
+        for char in self.folded[query_index:]:
+            position = lowered.find(char, position) + 1
+            if not position:
+                return False
+        return True
+    
+    def best(self, names, limit, budget):
+        """Get {name: score} for the limit best names, stopping once budget seconds have passed"""
+        deadline = time.perf_counter() + budget
+        heap = []
+        seen = set()
+        for count, name in enumerate(names, 1):
+            if name in seen:
+                continue
+            seen.add(name)
+            score = self.score(name)
+            if score is not None:
+                if len(heap) < limit:
+                    heapq.heappush(heap, (score, name))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, name))
+            if count % self.CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                break
+        return {name: score for score, name in heap}
+
+
+class WordIndex:
+    """Identifier counts for a document, updated only for the lines each edit touches"""
+    
+    WORD_PATTERN = re.compile(r'\w+')
+    
+    def __init__(self, document):
+        self.document = document
+        self.counts = {}  # word -> occurrences in the document
+        self.prefixes = PrefixIndex()  # The same words, for prefix lookups
+        self.recent = {}  # word -> edit number it was last written in
+        self.edits = 0
+        self.stale = False  # Recount everything on the next lookup
+        
+    def reload(self):
+        """Forget all counts; the whole text is recounted when next needed"""
+        self.counts = {}
+        self.prefixes = PrefixIndex()
+        self.recent = {}
+        self.stale = True
+        
+    def remove_lines(self, first_line, last_line):
+        """Uncount the words on lines an edit is about to replace"""
+        if self.stale:
+            return
+        counts = self.counts
+        for word in self.WORD_PATTERN.findall(self.document.get_lines(first_line, last_line)):
+            remaining = counts[word] - 1
+            if remaining:
+                counts[word] = remaining
+            else:
+                del counts[word]
+                self.recent.pop(word, None)
+                self.prefixes.remove(word)
+                
+    def add_lines(self, first_line, last_line, edited=True):
+        """Count the words on lines an edit has written"""
+        if self.stale:
+            return
+        counts = self.counts
+        recent = self.recent
+        self.edits += 1
+        new_words = []
+        for word in self.WORD_PATTERN.findall(self.document.get_lines(first_line, last_line)):
+            count = counts.get(word, 0)
+            if not count:
+                new_words.append(word)
+            counts[word] = count + 1
+            if edited:
+                recent[word] = self.edits
+        self.prefixes.add(new_words)
+        
+    def words(self):
+        """Get the word -> count mapping, recounting first if needed"""
+        if self.stale:
+            self.stale = False
+            self.add_lines(1, self.document.line_count(), edited=False)
+        return self.counts
+
+
+class StructureIndex:
+    """Bracket depth and indentation of every line, for bracket matching and auto-indent.
+    
+    Each line is summarized as (depth change, lowest depth reached
+    relative to its start, indent). Lines are grouped in blocks of up to
+    BLOCK_SIZE, and a segment tree over the blocks holds each block's
+    depth change, lowest depth and smallest indent, so finding a
+    matching or enclosing bracket or the enclosing block descends the
+    tree and scans at most a couple of blocks. Brackets in strings and
+    line comments are ignored; strings spanning lines are not tracked.
+    """
+    
+    BLOCK_SIZE = 128
+    OPENERS = '([{'
+    CLOSERS = ')]}'
+    PAIRS = {'(': ')', '[': ']', '{': '}'}
+    BLANK = sys.maxsize  # Indent of a blank line, never the smallest
+    TAB_WIDTH = 4
+    patterns = {}  # Bracket scanning regex by language
+    
+    def __init__(self, document, language='python'):
+        self.document = document
+        self.pattern = self.get_pattern(language)
+        self.blocks = [[(0, 0, self.BLANK)]]  # Line summaries
+        self.size = 1  # Leaves in the segment tree
+        self.count = self.total = self.low = self.indent = None
+        self.stale = True
+        
+    @classmethod
+    def get_pattern(cls, language):
+        """Get a regex matching brackets, strings and comments for a language"""
+        pattern = cls.patterns.get(language)
+        if pattern is None:
+            rules = [r'"(?:\\.|[^"\\\n])*"?', r"'(?:\\.|[^'\\\n])*'?"]
+            comment = Grammar.get(language).line_comment
+            if comment:
+                rules.append(comment)
+            rules.append(r'[()\[\]{}]')
+            pattern = cls.patterns[language] = re.compile('|'.join(rules))
+        return pattern
+    
+    def set_language(self, language):
+        self.pattern = self.get_pattern(language)
+        self.reload()
+        
+    def reload(self):
+        """Re-read every line, the next time a query needs them"""
+        self.stale = True
+        
+    def refresh(self):
+        if self.stale:
+            self.stale = False
+            lines = [self.summarize(line) for line in self.document.text().split('\n')]
+            self.blocks = [lines[i:i + self.BLOCK_SIZE] for i in range(0, len(lines), self.BLOCK_SIZE)]
+            self.rebuild()
+            
+    def summarize(self, text):
+        """Get (depth change, lowest depth relative to the line start, indent) for a line"""
+        depth = low = 0
+        for match in self.pattern.finditer(text):
+            char = match.group()
+            if char in self.OPENERS:
+                depth += 1
+            elif char in self.CLOSERS:
+                depth -= 1
+                low = min(low, depth)
+        if not text.strip():
+            return depth, low, self.BLANK
+        return depth, low, self.indent_of(text)
+    
+    def indent_of(self, text):
+        """Get the width of a line's leading whitespace"""
+        width = 0
+        for char in text:
+            if char == ' ':
+                width += 1
+            elif char == '\t':
+                width += self.TAB_WIDTH
+            else:
+                break
+        return width
+    
+    def brackets(self, text):
+        """Get (column, bracket) for the brackets on a line outside strings and comments"""
+        return [(m.start(), m.group()) for m in self.pattern.finditer(text)
+                if m.group() in self.OPENERS or m.group() in self.CLOSERS]
+    
+    # Segment tree over blocks
+    
+    def rebuild(self):
+        """Recompute the whole tree after blocks were added or removed"""
+        self.size = 1
+        while self.size < len(self.blocks):
+            self.size *= 2
+        self.count = [0] * (2 * self.size)
+        self.total = [0] * (2 * self.size)
+        self.low = [0] * (2 * self.size)
+        self.indent = [self.BLANK] * (2 * self.size)
+        for i in range(len(self.blocks)):
+            self.set_leaf(i)
+        for node in range(self.size - 1, 0, -1):
+            self.combine(node)
+            
+    def set_leaf(self, i):
+        depth = low = 0
+        indent = self.BLANK
+        for delta, line_low, line_indent in self.blocks[i]:
+            low = min(low, depth + line_low)
+            depth += delta
+            indent = min(indent, line_indent)
+        node = self.size + i
+        self.count[node] = len(self.blocks[i])
+        self.total[node] = depth
+        self.low[node] = low
+        self.indent[node] = indent
+        
+    def combine(self, node):
+        left, right = 2 * node, 2 * node + 1
+        self.count[node] = self.count[left] + self.count[right]
+        self.total[node] = self.total[left] + self.total[right]
+        self.low[node] = min(self.low[left], self.total[left] + self.low[right])
+        self.indent[node] = min(self.indent[left], self.indent[right])
+        
+    def update_block(self, i):
+        """Recompute one block's leaf and its ancestors"""
+        self.set_leaf(i)
+        node = (self.size + i) // 2
+        while node:
+            self.combine(node)
+            node //= 2
+            
+    def locate(self, line):
+        """Get (block, index in block, depth at the block's start) for a line"""
+        node, index, depth = 1, min(line, self.count[1]) - 1, 0
+        while node < self.size:
+            left = 2 * node
+            if index < self.count[left]:
+                node = left
+            else:
+                index -= self.count[left]
+                depth += self.total[left]
+                node = left + 1
+        return node - self.size, index, depth
+    
+    def first_line(self, block):
+        """Get the line number of a block's first line"""
+        node, line = self.size + block, 1
+        while node > 1:
+            if node % 2:
+                line += self.count[node - 1]
+            node //= 2
+        return line
+    
+    def search_forward(self, node, lo, hi, start, depth, target):
+        """Find the first block from start whose depth dips below target.
+        
+        depth is the depth at the start of block max(lo, start); returns
+        (block or None, depth at the start of that block or after the range).
+        """
+        if hi <= start:
+            return None, depth
+        if lo >= start and depth + self.low[node] >= target:
+            return None, depth + self.total[node]
+        if node >= self.size:
+            return node - self.size, depth
+        mid = (lo + hi) // 2
+        found, depth = self.search_forward(2 * node, lo, mid, start, depth, target)
+        if found is not None:
+            return found, depth
+        return self.search_forward(2 * node + 1, mid, hi, start, depth, target)
+    
+    def search_backward(self, node, lo, hi, end, depth, target):
+        """Find the last block before end whose depth dips below target.
+        
+        depth is the depth at the start of block min(hi, end); returns
+        (block or None, depth at the start of that block or of the range).
+        """
+        if lo >= end:
+            return None, depth
+        if hi <= end:
+            start_depth = depth - self.total[node]
+            if start_depth + self.low[node] >= target:
+                return None, start_depth
+            if node >= self.size:
+                return node - self.size, start_depth
+        mid = (lo + hi) // 2
+        found, depth = self.search_backward(2 * node + 1, mid, hi, end, depth, target)
+        if found is not None:
+            return found, depth
+        return self.search_backward(2 * node, lo, mid, end, depth, target)
+    
+    # Edits
+    
+    def replace_lines(self, first, old_last, new_last):
+        """Record an edit that replaced lines first..old_last with first..new_last"""
+        if self.stale:
+            return
+        summaries = [self.summarize(line) for line in self.document.get_lines(first, new_last).split('\n')]
+        block, index, _ = self.locate(first)
+        changed = {block}
+        remaining = old_last - first + 1
+        i, start = block, index
+        while remaining > 0 and i < len(self.blocks):
+            taken = min(remaining, len(self.blocks[i]) - start)
+            del self.blocks[i][start:start + taken]
+            changed.add(i)
+            remaining -= taken
+            i, start = i + 1, 0
+        self.blocks[block][index:index] = summaries
+        
+        # Keep blocks between empty and twice BLOCK_SIZE lines
+        resized = False
+        for i in sorted(changed, reverse=True):
+            lines = self.blocks[i]
+            if len(lines) > 2 * self.BLOCK_SIZE:
+                self.blocks[i:i + 1] = [lines[j:j + self.BLOCK_SIZE] for j in range(0, len(lines), self.BLOCK_SIZE)]
+                resized = True
+            elif not lines and len(self.blocks) > 1:
+                del self.blocks[i]
+                resized = True
+        if resized:
+            self.rebuild()
+        else:
+            for i in changed:
+                self.update_block(i)
+                
+    # Queries
+    
+    def depth_before(self, line, column):
+        """Get the bracket depth just before a column of a line"""
+        block, index, depth = self.locate(line)
+        for delta, _, _ in self.blocks[block][:index]:
+            depth += delta
+        for col, char in self.brackets(self.document.get_line(line)):
+            if col >= column:
+                break
+            depth += 1 if char in self.OPENERS else -1
+        return depth
+    
+    def find_below(self, line, column, target):
+        """Find the first bracket at or after (line, column) that brings the depth below target"""
+        self.refresh()
+        depth = self.depth_before(line, column)
+        for col, char in self.brackets(self.document.get_line(line)):
+            if col >= column:
+                depth += 1 if char in self.OPENERS else -1
+                if depth < target:
+                    return line, col
+        if line >= self.count[1]:
+            return None
+        block, index, start_depth = self.locate(line + 1)
+        # The rest of the next line's block, then the tree, then one block
+        for offset, (delta, low, _) in enumerate(self.blocks[block][index:]):
+            if depth + low < target:
+                return self.scan_forward(line + 1 + offset, depth, target)
+            depth += delta
+        found, depth = self.search_forward(1, 0, self.size, block + 1, depth, target)
+        if found is None:
+            return None
+        line = self.first_line(found)
+        for offset, (delta, low, _) in enumerate(self.blocks[found]):
+            if depth + low < target:
+                return self.scan_forward(line + offset, depth, target)
+            depth += delta
+        return None
+    
+    def scan_forward(self, line, depth, target):
+        for col, char in self.brackets(self.document.get_line(line)):
+            depth += 1 if char in self.OPENERS else -1
+            if depth < target:
+                return line, col
+        return None
+    
+    def find_open(self, line, column, target):
+        """Find the last opening bracket before (line, column) that leaves the depth at target"""
+        self.refresh()
+        depth = self.depth_before(line, column)
+        found = self.scan_backward(line, depth, target, column)
+        if found is not None or line <= 1:
+            return found
+        block, index, block_depth = self.locate(line)
+        depth = block_depth + sum(delta for delta, _, _ in self.blocks[block][:index])
+        # Depth at the start of each earlier line in this block, then the tree
+        for offset in range(index - 1, -1, -1):
+            delta, low, _ = self.blocks[block][offset]
+            depth -= delta
+            if depth + low < target:
+                return self.scan_backward(line - index + offset, depth + delta, target)
+        found, depth = self.search_backward(1, 0, self.size, block, depth, target)
+        if found is None:
+            return None
+        lines = self.blocks[found]
+        depth += sum(delta for delta, _, _ in lines)
+        first = self.first_line(found)
+        for offset in range(len(lines) - 1, -1, -1):
+            delta, low, _ = lines[offset]
+            depth -= delta
+            if depth + low < target:
+                return self.scan_backward(first + offset, depth + delta, target)
+        return None
+    
+    def scan_backward(self, line, depth, target, column=None):
+        """Walk a line's brackets backwards from depth (at column, or the line end) to the opener"""
+        for col, char in reversed(self.brackets(self.document.get_line(line))):
+            if column is not None and col >= column:
+                continue
+            if char in self.OPENERS:
+                depth -= 1
+                if depth < target:
+                    return line, col
+            else:
+                depth += 1
+        return None
+    
+    def match(self, line, column):
+        """Get the position of the bracket matching the one at (line, column), or None"""
+        text = self.document.get_line(line)
+        char = text[column:column + 1]
+        if (column, char) not in self.brackets(text):
+            return None  # Not a bracket, or one inside a string or comment
+        self.refresh()
+        depth = self.depth_before(line, column)
+        if char in self.OPENERS:
+            found = self.find_below(line, column + 1, depth + 1)
+            # A bracket closed by one of another kind has no match
+            if found is not None and self.document.get_line(found[0])[found[1]] == self.PAIRS[char]:
+                return found
+        else:
+            found = self.find_open(line, column, depth)
+            if found is not None and self.PAIRS.get(self.document.get_line(found[0])[found[1]]) == char:
+                return found
+        return None
+    
+    def enclosing_open(self, line, column):
+        """Get the position of the innermost bracket still open at (line, column), or None"""
+        self.refresh()
+        depth = self.depth_before(line, column)
+        if depth <= 0:
+            return None
+        return self.find_open(line, column, depth)
+    
+    def statement_start(self, line):
+        """Get the first line of the statement a line belongs to, going back past open brackets"""
+        self.refresh()
+        if self.depth_before(line, 0) <= 0:
+            return line
+        found = self.find_open(line, 0, 1)
+        return line if found is None else found[0]
+    
+    def enclosing_block(self, line):
+        """Get the last line before a line with a smaller indent, e.g. the header of its block"""
+        self.refresh()
+        block, index, _ = self.locate(line)
+        indent = self.blocks[block][index][2]
+        if indent == self.BLANK:
+            return None
+        for offset in range(index - 1, -1, -1):
+            if self.blocks[block][offset][2] < indent:
+                return line - index + offset
+        # Nearest earlier block holding a smaller indent
+        node = self.size + block
+        while node > 1:
+            if node % 2 and self.indent[node - 1] < indent:
+                node -= 1
+                while node < self.size:
+                    node = 2 * node + 1 if self.indent[2 * node + 1] < indent else 2 * node
+                found = node - self.size
+                lines = self.blocks[found]
+                first = self.first_line(found)
+                for offset in range(len(lines) - 1, -1, -1):
+                    if lines[offset][2] < indent:
+                        return first + offset
+            node //= 2
+        return None
+
+
+class WorkspaceIndex:
+    """Identifiers and definitions from every source file under a folder.
+    
+    Files are indexed on background threads and the results cached on
+    disk keyed by path, mtime and size, so reopening the folder only
+    re-reads files that changed. Lookups never wait for the indexer, they
+    read the last published snapshot.
+    """
+    
+    THREADS = 1  # Indexer threads
+    CPU_SHARE = 0.5  # Fraction of its time each indexer thread may spend working
+    MAX_FILE_SIZE = 1024 * 1024  # Larger files are skipped
+    SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist', 'target'}
+    CACHE_DIR = Path.home() / ".ide_ctk" / "index"
+    CACHE_VERSION = 1
+    DEFINITION_PATTERN = re.compile(
+        r'\b(?:def|class|function|func|fn|struct|interface|enum|trait|type|module)\s+([A-Za-z_]\w*)')
+    IDENTIFIER_PATTERN = re.compile(r'\b[A-Za-z_]\w+')
+    
+    def __init__(self, root_path):
+        self.root_path = os.path.abspath(root_path)
+        name = hashlib.sha1(self.root_path.encode('utf-8')).hexdigest() + ".json"
+        self.cache_path = self.CACHE_DIR / name
+        self.files = {}  # path -> {'mtime', 'size', 'identifiers', 'definitions'}
+        self.lock = threading.Lock()
+        self.changed = False
+        self.stopped = False
+        self.refresh_requests = queue.Queue()
+        # (definitions, identifiers, definition set), replaced whole on every publish
+        self.symbols = (PrefixIndex(), PrefixIndex(), frozenset())
+        threading.Thread(target=self.run, daemon=True).start()
+        
+    def prefixed(self, prefix, limit):
+        """Get up to limit indexed names starting with prefix, definitions first"""
+        definitions, identifiers, _ = self.symbols
+        names = definitions.prefixed(prefix, limit)
+        if len(names) < limit:
+            seen = set(names)
+            names += [name for name in identifiers.prefixed(prefix, limit) if name not in seen]
+        return names[:limit]
+    
+    def iter_prefixed(self, prefix):
+        """Yield the indexed names starting with prefix, definitions first; a name may come twice"""
+        definitions, identifiers, _ = self.symbols
+        return itertools.chain(definitions.iter_prefixed(prefix), identifiers.iter_prefixed(prefix))
+    
+    def is_definition(self, name):
+        """Check whether name is defined somewhere in the workspace"""
+        return name in self.symbols[2]
+    
+    def refresh(self, path):
+        """Re-index one file, e.g. after it was saved"""
+        self.refresh_requests.put(os.path.abspath(path))
+        
+    def stop(self):
+        """Stop indexing"""
+        self.stopped = True
+        self.refresh_requests.put(None)
+        
+    def run(self):
+        """Load the cache, bring it up to date, then serve refresh requests"""
+        self.load_cache()
+        self.publish()
+        self.scan()
+        while not self.stopped:
+            path = self.refresh_requests.get()
+            if path is None:
+                break
+            self.index_file(path)
+            if self.changed:
+                self.publish()
+                self.save_cache()
+                
+    def scan(self):
+        """Index every source file under the root on THREADS threads"""
+        paths = queue.Queue()
+        found = set()
+        for path in self.walk():
+            found.add(path)
+            paths.put(path)
+        workers = [threading.Thread(target=self.index_files, args=(paths,), daemon=True)
+                   for _ in range(max(1, self.THREADS))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        # Forget files that were deleted since the cache was written
+        with self.lock:
+            for path in set(self.files) - found:
+                del self.files[path]
+                self.changed = True
+        if self.changed and not self.stopped:
+            self.publish()
+            self.save_cache()
+            
+    def walk(self):
+        """Yield the source files under the root, skipping hidden and build folders"""
+        for folder, dirs, files in os.walk(self.root_path):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in self.SKIP_DIRS]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in LANGUAGE_EXTENSIONS:
+                    yield os.path.join(folder, name)
+                    
+    def index_files(self, paths):
+        """Index queued files, sleeping between them to stay within CPU_SHARE"""
+        while not self.stopped:
+            try:
+                path = paths.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            self.index_file(path)
+            busy = time.perf_counter() - start
+            time.sleep(busy * (1 - self.CPU_SHARE) / self.CPU_SHARE)
+            
+    def index_file(self, path):
+        """Extract one file's names unless the cached ones are still current"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.changed |= self.files.pop(path, None) is not None
+            return
+        cached = self.files.get(path)
+        if cached and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
+            return
+        if stat.st_size > self.MAX_FILE_SIZE:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+        except OSError:
+            return
+        entry = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'identifiers': sorted(set(self.IDENTIFIER_PATTERN.findall(text))),
+            'definitions': sorted(set(self.DEFINITION_PATTERN.findall(text))),
+        }
+        with self.lock:
+            self.files[path] = entry
+            self.changed = True
+            
+    def publish(self):
+        """Rebuild the lookup snapshot from the per-file entries"""
+        with self.lock:
+            entries = list(self.files.values())
+        definitions, identifiers = set(), set()
+        for entry in entries:
+            definitions.update(entry['definitions'])
+            identifiers.update(entry['identifiers'])
+        self.symbols = (PrefixIndex(definitions), PrefixIndex(identifiers), frozenset(definitions))
+        
+    def load_cache(self):
+        """Read the on-disk index for this root, if there is a usable one"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.CACHE_VERSION and data.get('root') == self.root_path:
+            self.files = data.get('files', {})
+            
+    def save_cache(self):
+        """Write the index to disk, replacing the old file in one step"""
+        with self.lock:
+            data = {'version': self.CACHE_VERSION, 'root': self.root_path, 'files': dict(self.files)}
+            self.changed = False
+        try:
+            self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+
+class PackageIndex:
+    """Public names of the modules installed for this Python, found without importing them.
+    
+    Top-level modules are listed from the import path and their source or
+    stub files parsed on a background thread. The result is cached on disk
+    together with the modification times of the import path folders, so it
+    is rebuilt only after packages are installed or removed, and then only
+    for modules whose files changed.
+    """
+    
+    instance = None
+    CPU_SHARE = 0.5  # Fraction of its time the indexer thread may spend working
+    PUBLISH_EVERY = 50  # Modules parsed between snapshots
+    MAX_FILE_SIZE = 2 * 1024 * 1024  # Larger source files are not parsed
+    MAX_STAR_DEPTH = 3  # Levels of "from x import *" followed
+    CACHE_DIR = WorkspaceIndex.CACHE_DIR
+    CACHE_VERSION = 2
+    EXTENSION_SUFFIXES = ('.so', '.pyd')
+    
+    def __init__(self):
+        # The script's own folder and the working directory are not installed packages
+        self.paths = [os.path.abspath(p) for p in sys.path[1:] if p and os.path.isdir(p)]
+        name = "packages-" + hashlib.sha1(sys.executable.encode('utf-8')).hexdigest() + ".json"
+        self.cache_path = self.CACHE_DIR / name
+        self.modules = {}  # name -> {'mtime', 'members'} with members space-separated
+        self.sources = {}  # name -> (path, mtime) of the top-level modules, while re-reading them
+        self.wanted = queue.Queue()  # Modules a lookup is waiting for, parsed first
+        # (module name index, name -> member list or None until parsed), replaced whole on every publish
+        self.symbols = (PrefixIndex(), {})
+        threading.Thread(target=self.run, daemon=True).start()
+        
+    @classmethod
+    def get(cls):
+        """Get the shared index, starting it on first use"""
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+    
+    def module_names(self, prefix=''):
+        """Get the installed top-level modules starting with prefix"""
+        return self.symbols[0].prefixed(prefix)
+    
+    def members(self, module):
+        """Get the public names of a top-level module, or None if it is unknown or not parsed yet"""
+        members = self.symbols[1].get(module)
+        if members is None and module in self.symbols[1]:
+            self.wanted.put(module)
+        return members
+    
+    def run(self):
+        """Load the cache and, if the environment changed, re-read the modules that did"""
+        environment = self.environment()
+        cached = self.load_cache()
+        if cached is not None and cached['environment'] == environment:
+            self.modules = cached['modules']
+            self.publish()
+            return
+        old = cached['modules'] if cached is not None else {}
+        
+        sources = self.sources = self.find_modules()
+        self.modules = {name: old[name] for name, (_, mtime) in sources.items()
+                        if name in old and old[name]['mtime'] == mtime}
+        self.publish(sources)
+        pending = [name for name in sources if name not in self.modules]
+        parsed = 0
+        while pending:
+            name = self.next_module(pending)
+            start = time.perf_counter()
+            path, mtime = sources[name]
+            self.modules[name] = {'mtime': mtime, 'members': ' '.join(sorted(self.read_members(name, path)))}
+            busy = time.perf_counter() - start
+            parsed += 1
+            if parsed % self.PUBLISH_EVERY == 0 or not self.wanted.empty():
+                self.publish(sources)
+            time.sleep(busy * (1 - self.CPU_SHARE) / self.CPU_SHARE)
+        self.publish()
+        self.save_cache(environment)
+        
+    def next_module(self, pending):
+        """Take a module a lookup asked for if there is one, else the next in line"""
+        while not self.wanted.empty():
+            name = self.wanted.get_nowait()
+            if name in pending:
+                pending.remove(name)
+                return name
+        return pending.pop()
+    
+    def environment(self):
+        """Describe the interpreter and import path so the cache can tell when it is out of date"""
+        stamps = []
+        for path in self.paths:
+            try:
+                stamps.append([path, os.stat(path).st_mtime])
+            except OSError:
+                pass
+        return [sys.executable, sys.version, stamps]
+    
+    def find_modules(self):
+        """Map each importable top-level module to (source or stub path or None, mtime)"""
+        sources = {name: (None, None) for name in sys.builtin_module_names}
+        for folder in self.paths:
+            try:
+                entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            found = {}
+            for entry in entries:
+                name, suffix = entry.name, ''
+                if entry.is_dir():
+                    stubs = name.endswith('-stubs')
+                    name = name[:-len('-stubs')] if stubs else name
+                    init = self.package_init(entry.path)
+                    if init is None or not name.isidentifier():
+                        continue
+                    if stubs or name not in found:
+                        found[name] = init
+                    continue
+                name, _, suffix = name.partition('.')
+                if not name.isidentifier():
+                    continue
+                if suffix == 'pyi' or (suffix == 'py' and name not in found):
+                    found[name] = entry.path
+                elif suffix.endswith(self.EXTENSION_SUFFIXES) and name not in found:
+                    found[name] = None
+            for name, path in found.items():
+                # Earlier folders on the import path win, as they do for import
+                if name not in sources:
+                    try:
+                        sources[name] = (path, os.stat(path).st_mtime if path else None)
+                    except OSError:
+                        sources[name] = (None, None)
+        return sources
+    
+    def package_init(self, folder):
+        """Get the stub or source __init__ of a package folder, or None if it is not one"""
+        for name in ('__init__.pyi', '__init__.py'):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return path
+        return None
+    
+    def read_members(self, name, path, depth=0):
+        """Collect the public names a module file defines, imports and re-exports"""
+        if path is None:
+            # Compiled modules have no source; those already loaded can be listed for free
+            module = sys.modules.get(name)
+            return {n for n in dir(module) if not n.startswith('_')} if module is not None else set()
+        names, submodules = set(), set()
+        folder = os.path.dirname(path)
+        if os.path.basename(path).startswith('__init__.'):
+            # Submodules and subpackages are attributes of a package once imported
+            try:
+                for entry in os.scandir(folder):
+                    module, _, suffix = entry.name.partition('.')
+                    if module.isidentifier() and not module.startswith('_') and (
+                            suffix in ('py', 'pyi') or (entry.is_dir() and self.package_init(entry.path))):
+                        submodules.add(module)
+            except OSError:
+                pass
+        try:
+            if os.path.getsize(path) > self.MAX_FILE_SIZE:
+                return submodules
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError, ValueError, RecursionError):
+            return submodules
+        
+        exported = set()  # Names listed in __all__, if it is built from literal lists only
+        all_kinds = set()
+        all_mutated = False  # __all__ grown after it is assigned, so it lists only some of the names
+        statements = list(tree.body)
+        while statements:
+            node = statements.pop()
+            if isinstance(node, (ast.If, ast.Try)):
+                # Names bound under version checks and import fallbacks count too
+                statements.extend(node.body + node.orelse + getattr(node, 'finalbody', []))
+                for handler in getattr(node, 'handlers', []):
+                    statements.extend(handler.body)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                for target in node.targets if isinstance(node, ast.Assign) else [node.target]:
+                    if not isinstance(target, ast.Name):
+                        continue
+                    names.add(target.id)
+                    if target.id == '__all__':
+                        literal = isinstance(node.value, (ast.List, ast.Tuple))
+                        all_kinds.add(literal)
+                        all_mutated |= isinstance(node, ast.AugAssign)
+                        if literal:
+                            exported.update(e.value for e in node.value.elts
+                                            if isinstance(e, ast.Constant) and isinstance(e.value, str))
+            elif (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+                  and isinstance(node.value.func, ast.Attribute)
+                  and isinstance(node.value.func.value, ast.Name) and node.value.func.value.id == '__all__'):
+                # __all__.extend(...), .append(...) and the like
+                all_mutated = True
+            elif isinstance(node, ast.Import):
+                names.update(alias.asname or alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    if alias.name != '*':
+                        names.add(alias.asname or alias.name)
+                    elif depth < self.MAX_STAR_DEPTH and node.level:
+                        star_path = self.relative_module(folder, node)
+                        if star_path is not None:
+                            names |= self.read_members(name, star_path, depth + 1)
+                    elif depth < self.MAX_STAR_DEPTH and node.module:
+                        found, star_path = self.absolute_module(node.module)
+                        if found:
+                            names |= self.read_members(node.module, star_path, depth + 1)
+        if all_kinds == {True} and not all_mutated:
+            names = exported
+        else:
+            names |= exported
+        return {n for n in names | submodules if not n.startswith('_')}
+    
+    def relative_module(self, folder, node):
+        """Find the file a "from .x import *" inside a package refers to"""
+        if not node.level:
+            return None
+        for _ in range(node.level - 1):
+            folder = os.path.dirname(folder)
+        return self.module_file(folder, node.module)
+    
+    def absolute_module(self, module):
+        """Find the file a "from x.y import *" refers to: (found, source path or None if compiled)"""
+        top, *rest = module.split('.')
+        if top not in self.sources:
+            return False, None
+        path = self.sources[top][0]
+        if not rest:
+            return True, path
+        if path is None or not os.path.basename(path).startswith('__init__.'):
+            return False, None
+        path = self.module_file(os.path.dirname(path), '.'.join(rest))
+        return path is not None, path
+    
+    def module_file(self, folder, module):
+        """Find the stub or source file of a module relative to a folder, or None"""
+        base = os.path.join(folder, *module.split('.')) if module else folder
+        init = self.package_init(base) if os.path.isdir(base) else None
+        if init is not None:
+            return init
+        for suffix in ('.pyi', '.py'):
+            if os.path.isfile(base + suffix):
+                return base + suffix
+        return None
+    
+    def publish(self, sources=()):
+        """Rebuild the lookup snapshot; modules in sources that are not parsed yet look up as None"""
+        members = dict.fromkeys(sources)
+        members.update((name, entry['members'].split()) for name, entry in list(self.modules.items()))
+        self.symbols = (PrefixIndex(members), members)
+        
+    def load_cache(self):
+        """Read the on-disk index for this interpreter, if there is a usable one"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != self.CACHE_VERSION or data.get('executable') != sys.executable:
+            return None
+        return data
+    
+    def save_cache(self, environment):
+        """Write the index to disk, replacing the old file in one step"""
+        data = {'version': self.CACHE_VERSION, 'executable': sys.executable,
+                'environment': environment, 'modules': self.modules}
+        try:
+            self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix('.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+
+class ScopeCollector(ast.NodeVisitor):
+    """Collects the names, variable types and class members of each scope in a Python module"""
+    
+    def __init__(self):
+        self.scopes = []
+        self.classes = {}  # class name -> {'members': set, 'bases': [names]}
+        self.imports = {}  # local name -> imported module
+        self.stack = []
+        
+    def collect(self, tree):
+        """Summarize a parsed module"""
+        self.push('module', '', 1, sys.maxsize)
+        self.generic_visit(tree)
+        self.stack.pop()
+        return {'scopes': self.scopes, 'classes': self.classes, 'imports': self.imports}
+    
+    def push(self, kind, name, first_line, last_line, class_name=None):
+        scope = {'kind': kind, 'name': name, 'first': first_line, 'last': last_line,
+                 'class': class_name, 'names': set(), 'types': {}}
+        self.scopes.append(scope)
+        self.stack.append(scope)
+        return scope
+    
+    def define(self, name):
+        self.stack[-1]['names'].add(name)
+        if self.stack[-1]['kind'] == 'class':
+            self.classes[self.stack[-1]['name']]['members'].add(name)
+            
+    def visit_FunctionDef(self, node):
+        self.define(node.name)
+        enclosing = self.stack[-1]
+        class_name = enclosing['name'] if enclosing['kind'] == 'class' else enclosing['class']
+        self.push('function', node.name, node.lineno, getattr(node, 'end_lineno', None) or node.lineno, class_name)
+        arguments = node.args
+        for arg in (getattr(arguments, 'posonlyargs', []) + arguments.args + arguments.kwonlyargs
+                    + [a for a in (arguments.vararg, arguments.kwarg) if a]):
+            self.define(arg.arg)
+        for statement in node.body:
+            self.visit(statement)
+        self.stack.pop()
+        
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_ClassDef(self, node):
+        self.define(node.name)
+        bases = [base.id if isinstance(base, ast.Name) else getattr(base, 'attr', '') for base in node.bases]
+        self.classes[node.name] = {'members': set(), 'bases': [b for b in bases if b]}
+        self.push('class', node.name, node.lineno, getattr(node, 'end_lineno', None) or node.lineno)
+        for statement in node.body:
+            self.visit(statement)
+        self.stack.pop()
+        
+    def visit_Lambda(self, node):
+        pass  # Lambda parameters are not visible outside the lambda
+    
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split('.')[0]
+            self.define(name)
+            self.imports[name] = alias.name if alias.asname else name
+            
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name != '*':
+                name = alias.asname or alias.name
+                self.define(name)
+                self.imports[name] = f"{node.module or ''}.{alias.name}"
+                
+    def visit_Assign(self, node):
+        for target in node.targets:
+            self.assign(target, node.value)
+        self.visit(node.value)
+        
+    def visit_AnnAssign(self, node):
+        self.assign(node.target, node.value)
+        annotation = node.annotation
+        if isinstance(node.target, ast.Name) and isinstance(annotation, ast.Name):
+            self.stack[-1]['types'][node.target.id] = annotation.id
+        if node.value is not None:
+            self.visit(node.value)
+            
+    def visit_AugAssign(self, node):
+        self.assign(node.target, None)
+        self.visit(node.value)
+        
+    def visit_NamedExpr(self, node):
+        self.assign(node.target, node.value)
+        self.visit(node.value)
+        
+    def visit_For(self, node):
+        self.assign(node.target, None)
+        self.generic_visit(node)
+        
+    visit_AsyncFor = visit_For
+    
+    def visit_withitem(self, node):
+        if node.optional_vars is not None:
+            self.assign(node.optional_vars, node.context_expr)
+        self.visit(node.context_expr)
+        
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.define(node.name)
+        self.generic_visit(node)
+        
+    def visit_comprehension(self, node):
+        self.generic_visit(node)  # Comprehension variables stay inside the comprehension
+        
+    def assign(self, target, value):
+        """Define the names a target binds and remember the class of simple constructor calls"""
+        if isinstance(target, ast.Name):
+            self.define(target.id)
+            if isinstance(value, ast.Call):
+                called = value.func
+                class_name = called.id if isinstance(called, ast.Name) else getattr(called, 'attr', None)
+                if class_name:
+                    self.stack[-1]['types'][target.id] = class_name
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.assign(element, None)
+        elif isinstance(target, ast.Starred):
+            self.assign(target.value, None)
+        elif (isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name)
+                and target.value.id == 'self' and self.stack[-1]['class'] in self.classes):
+            # self.x = ... inside a method adds a member to its class
+            self.classes[self.stack[-1]['class']]['members'].add(target.attr)
+            
+            
+def analyze_python(source):
+    """Summarize a Python module's scopes for completion; runs in a worker process.
+    
+    Returns None when the source does not parse, or nests too deeply to walk.
+    """
+    try:
+        return ScopeCollector().collect(ast.parse(source))
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+
+
+class PythonAnalyzer:
+    """Parses an editor's Python source off the Tk thread and answers scope and member queries.
+    
+    Summaries are cached by content hash, so unchanged text is never parsed
+    twice, and a source that fails to parse leaves the last good summary
+    in place.
+    """
+    
+    pool = None  # Worker process shared by all editors
+    cache = {}  # sha1 of source -> summary (None if it did not parse), oldest first
+    CACHE_SIZE = 32
+    POLL_INTERVAL = 20  # Milliseconds between checks for a finished parse
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.summary = None  # Last good summary
+        self.future = None  # Parse in flight
+        self.future_key = None
+        self.future_source = None
+        self.queued = None  # Newest source that arrived while a parse was in flight
+        
+    @classmethod
+    def get_pool(cls):
+        """Get the worker process pool, falling back to a thread where processes are unavailable"""
+        if cls.pool is None:
+            try:
+                cls.pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, ValueError, NotImplementedError):
+                cls.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        return cls.pool
+    
+    def analyze(self, source):
+        """Bring the summary up to date with source, in the background if it needs parsing"""
+        key = hashlib.sha1(source.encode('utf-8', 'surrogatepass')).hexdigest()
+        if key in self.cache:
+            self.queued = None  # Older text waiting for the parse must not replace this summary
+            summary = self.cache.pop(key)
+            self.cache[key] = summary  # Most recently used goes last
+            if summary is not None:
+                self.summary = summary
+            return
+        if self.future is not None:
+            # The parse in flight is for this text if the buffer changed back to it
+            self.queued = source if key != self.future_key else None
+            return
+        
+        try:
+            self.future = self.get_pool().submit(analyze_python, source)
+        except RuntimeError:
+            # The worker process died; parse on a thread from now on
+            PythonAnalyzer.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            self.future = self.pool.submit(analyze_python, source)
+        self.future_key = key
+        self.future_source = source
+        self.widget.after(self.POLL_INTERVAL, self.poll)
+        
+    def poll(self):
+        """Pick up a finished parse and start the queued one, if any"""
+        if not self.future.done():
+            self.widget.after(self.POLL_INTERVAL, self.poll)
+            return
+        source = self.future_source
+        try:
+            summary = self.future.result()
+        except concurrent.futures.BrokenExecutor:
+            # The worker process died; parse on a thread from now on
+            PythonAnalyzer.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            self.future = self.future_key = self.future_source = None
+            self.analyze(source)
+            return
+        except Exception:
+            summary = None  # Never retried: the same text would fail the same way
+        self.cache[self.future_key] = summary
+        if len(self.cache) > self.CACHE_SIZE:
+            del self.cache[next(iter(self.cache))]
+        if summary is not None:
+            self.summary = summary
+        self.future = self.future_key = self.future_source = None
+        
+        queued, self.queued = self.queued, None
+        if queued is not None:
+            self.analyze(queued)
+            
+    def scope_chain(self, line):
+        """Get the scopes enclosing a line, innermost first"""
+        if self.summary is None:
+            return []
+        scopes = [scope for scope in self.summary['scopes'] if scope['first'] <= line <= scope['last']]
+        return sorted(scopes, key=lambda scope: scope['first'], reverse=True)
+    
+    def visible_names(self, line):
+        """Get the names defined in the scopes enclosing a line"""
+        names = set()
+        for depth, scope in enumerate(self.scope_chain(line)):
+            # Class bodies are not visible from the methods inside them
+            if scope['kind'] != 'class' or depth == 0:
+                names |= scope['names']
+        return names
+    
+    def members(self, receiver, line):
+        """Get the attributes of the object named receiver at a line, or None if unknown"""
+        chain = self.scope_chain(line)
+        if not chain:
+            return None
+        classes = self.summary['classes']
+        class_name = None
+        if receiver in ('self', 'cls'):
+            class_name = next((scope['class'] for scope in chain if scope['class']), None)
+        elif receiver in classes:
+            class_name = receiver
+        else:
+            class_name = next((scope['types'][receiver] for scope in chain if receiver in scope['types']), None)
+        if class_name not in classes:
+            return None
+        
+        # Include inherited members from classes defined in the same module
+        members, seen, pending = set(), set(), [class_name]
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in classes:
+                continue
+            seen.add(name)
+            members |= classes[name]['members']
+            pending.extend(classes[name]['bases'])
+        return members
+
+
+class CompletionPipeline:
+    """Runs slow completion providers off the Tk thread for an editor.
+    
+    Each request is tagged with the document version and cursor it was
+    made for. Results are handed back on the Tk thread only while that
+    tag still matches the editor, so answers for text that has since
+    changed are dropped instead of flashing stale suggestions.
+    """
+    
+    pool = None  # Worker thread shared by all editors
+    POLL_INTERVAL = 10  # Milliseconds between checks for finished providers
+    
+    def __init__(self, widget, current_request):
+        self.widget = widget
+        self.current_request = current_request  # Callable giving the editor's request tag now
+        self.request = None  # Tag of the newest request
+        self.running = []  # (future, callback) for providers of the newest request
+        self.poll_id = None
+        
+    @classmethod
+    def get_pool(cls):
+        """Get the worker thread pool, starting it on first use"""
+        if cls.pool is None:
+            cls.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        return cls.pool
     
-    def __init__(self, parent, text_widget, **kwargs):
-        super().__init__(parent, width=50, bg="#2b2b2b", highlightthickness=0, **kwargs)
-        self.text_widget = text_widget
-        
-    def redraw(self, *args):
-        """Redraw line numbers"""
-        self.delete("all")
+    def start(self):
+        """Begin a request for the editor's current state, dropping older ones"""
+        self.cancel()
+        self.request = self.current_request()
+        
+    def cancel(self):
+        """Drop the current request and cancel its providers that have not started"""
+        for future, _ in self.running:
+            future.cancel()
+        self.running = []
+        self.request = None
+        
+    def submit(self, provider, callback):
+        """Run provider() in the background and pass its result to callback if still current"""
+        request = self.request
+        if request is None:
+            return
+        future = self.get_pool().submit(self.run_provider, provider, request)
+        self.running.append((future, callback))
+        if self.poll_id is None:
+            self.poll_id = self.widget.after(self.POLL_INTERVAL, self.poll)
+        
+    def run_provider(self, provider, request):
+        """Call provider unless its request was replaced while it waited"""
+        if request != self.request:
+            return None
+        return provider()
+    
+    def poll(self):
+        """Deliver finished results for the current request"""
+        self.poll_id = None
+        running, self.running = self.running, []
+        finished = []
+        for future, callback in running:
+            (finished if future.done() else self.running).append((future, callback))
+        if self.running:
+            self.poll_id = self.widget.after(self.POLL_INTERVAL, self.poll)
+        if not finished:
+            return
         
-        i = self.text_widget.index("@0,0")
-        while True:
-            dline = self.text_widget.dlineinfo(i)
-            if dline is None:
-                break
-            y = dline[1]
-            linenum = str(i).split(".")[0]
-            self.create_text(2, y, anchor="nw", text=linenum, fill="#858585", font=("Consolas", 10))
-            i = self.text_widget.index(f"{i}+1line")
+        if self.request is None or self.request != self.current_request():
+            self.cancel()
+            return
+        for future, callback in finished:
+            try:
+                result = future.result()
+            except Exception:
+                continue  # A failing provider only loses its own suggestions
+            if result is not None:
+                callback(result)
 
 
 class CodeEditor(ctk.CTkFrame):
     """Code editor with line numbers and syntax highlighting"""
     
-    def __init__(self, parent, language='python'):
+    # Debounce per scheduled job in milliseconds (0 = next idle cycle)
+    JOB_DELAYS = {'highlight': 0, 'gutter': 0, 'brackets': 0, 'structure': 0, 'completion': 30, 'analysis': 300}
+    
+    LOAD_WAIT = 50  # Milliseconds between checks for a file that is still loading
+    
+    # Indentation
+    INDENT_WIDTH = 4
+    DEDENT_KEYWORDS = {'return', 'pass', 'break', 'continue', 'raise'}  # Python lines that end a block
+    
+    # Suggestion ranking
+    MAX_SUGGESTIONS = 15
+    PROXIMITY_LINES = 30  # Lines above and below the cursor that count as nearby
+    RECENCY_WEIGHT = 3.0
+    PROXIMITY_WEIGHT = 2.0
+    LANGUAGE_WEIGHT = 1.0
+    CASE_WEIGHT = 0.5
+    DEFINITION_WEIGHT = 0.5
+    SCOPE_WEIGHT = 1.0
+    MATCH_WEIGHT = 2.0  # Times the match quality: 1 for a prefix, less for an abbreviation
+    FUZZY_BUDGET = 0.0003  # Seconds abbreviation matching may take per lookup, shared by buffer and workspace
+    FUZZY_POOL = 5000  # Most file and workspace names tried as abbreviation matches
+    WORKSPACE_CANDIDATES = 50  # Most names taken from the workspace index per lookup
+    IMPORT_PATTERN = re.compile(r'\s*(?:from\s+|import\s+(?:[\w.]+(?:\s+as\s+\w+)?\s*,\s*)*)$')
+    FROM_IMPORT_PATTERN = re.compile(r'\s*from\s+(\w+)\s+import\s+\(?\s*(?:\w+(?:\s+as\s+\w+)?\s*,\s*)*$')
+    
+    def __init__(self, parent, language='python', workspace=None):
         super().__init__(parent, fg_color="#1e1e1e")
         
         self.language = language
         self.file_path = None
+        self.encoding = 'utf-8'  # Used when saving; files keep the encoding they were opened with
+        self.read_only = False  # Set while a file is still loading
+        self.workspace = workspace  # WorkspaceIndex of the open folder, if any
         
         # Create text widget with scrollbar
         text_frame = ctk.CTkFrame(self, fg_color="#1e1e1e")
@@ -283,45 +2713,211 @@ class CodeEditor(ctk.CTkFrame):
             insertbackground="white",
             selectbackground="#264f78",
             font=("Consolas", 11),
-            undo=True,
-            maxundo=-1
+            undo=False  # The editor keeps its own bounded history in self.journal
         )
         self.text_widget.pack(side="left", fill="both", expand=True)
+        self.text_widget.tag_config("bracket_match", background="#3a3d41", foreground="#ffd700")
         
         # Update line numbers reference
         self.line_numbers.text_widget = self.text_widget
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(text_frame, command=self.text_widget.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.text_widget.config(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(text_frame, command=self.text_widget.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text_widget.config(yscrollcommand=self.on_yscroll)
+        
+        # Shadow copy of the text that analysis reads instead of the widget
+        self.document = Document()
+        self.word_index = WordIndex(self.document)
+        self.structure = StructureIndex(self.document, language)
+        self.journal = UndoJournal(self.text_widget)
         
         # Syntax highlighter
-        self.highlighter = SyntaxHighlighter(self.text_widget, language)
+        self.highlighter = SyntaxHighlighter(self.text_widget, self.document, language)
+        
+        # Route every insert/delete through a proxy so edits can be tracked
+        self.install_edit_hook()
         
-        # Autocomplete popup
-        self.autocomplete = AutocompletePopup(self, self.text_widget)
+        # Coalesce highlighting, gutter and completion work across bursts of keys
+        self.scheduler = EditScheduler(self.text_widget)
+        self.scheduler.add_job('highlight', self.highlighter.highlight_dirty, self.JOB_DELAYS['highlight'])
+        self.scheduler.add_job('gutter', self.line_numbers.redraw, self.JOB_DELAYS['gutter'])
+        self.scheduler.add_job('brackets', self.highlight_brackets, self.JOB_DELAYS['brackets'])
+        self.scheduler.add_job('structure', self.structure.refresh, self.JOB_DELAYS['structure'])
+        self.scheduler.add_job('completion', self.show_autocomplete, self.JOB_DELAYS['completion'])
+        
+        # Python source is parsed in a worker process for scope-aware completion
+        self.analyzer = PythonAnalyzer(self.text_widget)
+        if language == 'python':
+            PackageIndex.get()  # Start listing installed modules before the first import is typed
+        self.scheduler.add_job('analysis', self.analyze_source, self.JOB_DELAYS['analysis'])
+        
+        # Autocomplete popup, filled in by providers as their results arrive
+        self.autocomplete = AutocompletePopup.shared(self)
+        self.completion = CompletionPipeline(self.text_widget, self.completion_request)
         
         # Bind events
         self.text_widget.bind("<KeyRelease>", self.on_key_release)
         self.text_widget.bind("<KeyPress>", self.on_key_press)
         self.text_widget.bind("<Control-space>", lambda e: self.show_autocomplete())
-        self.text_widget.bind("<MouseWheel>", lambda e: self.line_numbers.redraw())
+        if sys.platform == 'win32':
+            # Ctrl+Y is redo on Windows only; on X11 Tk uses it to paste
+            self.text_widget.bind("<Control-y>", lambda e: self.replay("redo") or "break")
         self.text_widget.bind("<Button-1>", lambda e: self.on_click())
         
+    def install_edit_hook(self):
+        """Intercept the Tk text widget command to observe all edits"""
+        widget = self.text_widget
+        self.widget_command = widget._w + "_orig"
+        widget.tk.call("rename", widget._w, self.widget_command)
+        widget.tk.createcommand(widget._w, self.widget_proxy)
+        
+    def widget_proxy(self, *args):
+        """Forward a widget command, mirror edits into the document and report changed lines"""
+        tk_call = self.text_widget.tk.call
+        if not args or args[0] not in ("insert", "delete", "replace", "edit"):
+            return tk_call((self.widget_command,) + args)
+        
+        def line_of(index):
+            # "end" is the line after the last one, Tk edits there land on end-1c
+            line = int(str(tk_call(self.widget_command, "index", index)).split('.')[0])
+            return min(line, self.document.line_count())
+        
+        def offset_of(index):
+            line, column = map(int, str(tk_call(self.widget_command, "index", index)).split('.'))
+            if line > self.document.line_count():
+                # Tk never edits past the final newline, so "end" means end-1c
+                return self.document.length()
+            return self.document.offset(line, column)
+        
+        if args[0] == "edit":
+            # Tk's own undo stack is off; its edit commands (and <<Undo>>/<<Redo>>) use the journal
+            if len(args) > 1 and args[1] in ("undo", "redo"):
+                self.replay(args[1])
+                return ""
+            if len(args) > 1 and args[1] in ("canundo", "canredo"):
+                return int(self.journal.can_undo() if args[1] == "canundo" else self.journal.can_redo())
+            if len(args) > 1 and args[1] == "separator":
+                self.journal.separator()
+                return ""
+            if len(args) > 1 and args[1] == "reset":
+                self.journal.clear()
+            return tk_call((self.widget_command,) + args)
+        if tk_call(self.widget_command, "cget", "-state") == "disabled":
+            return ""  # Tk ignores edits to a disabled widget
+        
+        first_line = line_of(args[1])
+        if args[0] == "insert":
+            last_line = first_line
+        else:
+            # A lone index deletes one character, which may be a newline
+            last_line = line_of(args[2] if len(args) > 2 else f"{args[1]}+1c")
+        lines_before = self.document.line_count()
+        
+        # Resolve the edit against the document before Tk moves any marks
+        edit = None
+        if args[0] == "insert":
+            start = offset_of(args[1])
+            edit = (start, start, ''.join(str(chars) for chars in args[2::2]))
+        elif args[0] == "replace":
+            edit = (offset_of(args[1]), offset_of(args[2]), ''.join(str(chars) for chars in args[3::2]))
+        elif len(args) <= 3:
+            end = args[2] if len(args) == 3 else f"{args[1]}+1c"
+            edit = (offset_of(args[1]), offset_of(end), '')
+            
+        removed = self.document.text() if edit is None else self.document.get(edit[0], edit[1])
+        result = tk_call((self.widget_command,) + args)
+        
+        if edit is None:
+            # Several ranges deleted at once, copy the text back instead
+            self.document.load(str(tk_call(self.widget_command, "get", "1.0", "end-1c")))
+            self.word_index.reload()
+            self.structure.reload()
+            self.journal.record(0, removed, self.document.text())
+        else:
+            self.journal.record(edit[0], removed, edit[2])
+            if edit[0] == 0 and edit[1] == self.document.length():
+                # The whole text is replaced (e.g. a file was loaded), recount when needed
+                self.word_index.reload()
+                self.structure.reload()
+            else:
+                self.word_index.remove_lines(first_line, last_line)
+            self.document.replace(*edit)
+        new_last_line = last_line + self.document.line_count() - lines_before
+        self.word_index.add_lines(first_line, new_last_line)
+        self.structure.replace_lines(first_line, last_line, new_last_line)
+        self.highlighter.mark_dirty(first_line, last_line, new_last_line)
+        if new_last_line != last_line:
+            self.scheduler.mark_stale('gutter')  # Numbers below the edit moved
+        return result
+        
+    def replay(self, action):
+        """Undo or redo the newest group of edits from the journal"""
+        group = self.journal.pop_undo() if action == "undo" else self.journal.pop_redo()
+        if group is None:
+            return
+        records = reversed(group) if action == "undo" else group
+        self.journal.paused = True
+        try:
+            for offset, removed, inserted in records:
+                old, new = (inserted, removed) if action == "undo" else (removed, inserted)
+                start = "%d.%d" % self.document.position(offset)
+                if old:
+                    self.text_widget.delete(start, "%d.%d" % self.document.position(offset + len(old)))
+                if new:
+                    self.text_widget.insert(start, new)
+                cursor = offset + len(new)
+        finally:
+            self.journal.paused = False
+        self.text_widget.mark_set("insert", "%d.%d" % self.document.position(cursor))
+        self.text_widget.see("insert")
+        
+    def go_to(self, line, column, length):
+        """Select length characters at a line and column, once the file has finished loading"""
+        if self.read_only:
+            self.after(self.LOAD_WAIT, lambda: self.go_to(line, column, length))
+            return
+        widget = self.text_widget
+        widget.tag_remove("sel", "1.0", "end")
+        widget.tag_add("sel", f"{line}.{column}", f"{line}.{column + length}")
+        widget.mark_set("insert", f"{line}.{column}")
+        widget.see("insert")
+        widget.focus_set()
+        
+    def on_yscroll(self, first, last):
+        """Update the scrollbar and gutter, and highlight newly exposed lines first"""
+        self.scrollbar.set(first, last)
+        self.scheduler.mark_stale('gutter')
+        self.highlighter.highlight_visible()
+        
     def on_click(self):
         """Handle mouse click"""
-        self.autocomplete.hide()
-        self.line_numbers.redraw()
+        self.hide_autocomplete()
+        self.scheduler.mark_stale('brackets')  # Runs once the click has moved the cursor
+        
+    def highlight_brackets(self):
+        """Mark the bracket next to the cursor and the one it pairs with"""
+        widget = self.text_widget
+        widget.tag_remove("bracket_match", "1.0", "end")
+        line, col = map(int, widget.index("insert").split('.'))
+        # The bracket just typed (before the cursor) wins over the one after it
+        for column in (col - 1, col):
+            if column >= 0 and widget.get(f"{line}.{column}") in '()[]{}':
+                found = self.structure.match(line, column)
+                if found is not None:
+                    widget.tag_add("bracket_match", f"{line}.{column}")
+                    widget.tag_add("bracket_match", "%d.%d" % found)
+                    return
         
     def on_key_press(self, event):
         """Handle key press for autocomplete navigation, bracket closing, and indentation"""
         # Handle autocomplete navigation when popup is visible
-        if self.autocomplete.winfo_viewable():
+        if self.autocomplete.showing(self.text_widget):
             if event.keysym == "Escape":
-                self.autocomplete.hide()
+                self.hide_autocomplete()
                 return "break"
             elif event.keysym == "Return" or event.keysym == "Tab":
+                self.scheduler.cancel('completion')
                 self.autocomplete.insert_selection()
                 return "break"
             elif event.keysym == "Up":
@@ -374,62 +2970,60 @@ class CodeEditor(ctk.CTkFrame):
                 return "break"
     
     def auto_indent(self):
-        """Auto-indent when Return key is pressed"""
-        # Get current cursor position
+        """Auto-indent when Return key is pressed, from the bracket and block structure"""
         cursor_pos = self.text_widget.index("insert")
         line, col = map(int, cursor_pos.split('.'))
-        
-        # Get current line text
-        current_line = self.text_widget.get(f"{line}.0", f"{line}.end")
-        
-        # Calculate current indentation
-        indent = 0
-        for char in current_line:
-            if char == ' ':
-                indent += 1
-            elif char == '\t':
-                indent += 4  # Treat tab as 4 spaces
+        before = self.document.get_line(line)[:col]
+        structure = self.structure
+        
+        opener = structure.enclosing_open(line, col)
+        if opener is not None:
+            open_line, open_col = opener
+            open_text = self.document.get_line(open_line)
+            following = open_text[open_col + 1:col if open_line == line else None]
+            if following.strip():
+                # Line up with the first argument after the open bracket
+                indent = open_col + 1 + len(following) - len(following.lstrip())
             else:
-                break
-        
-        # Check if the line ends with certain characters that require extra indentation
-        stripped_line = current_line.strip()
-        extra_indent = 0
-        
-        # For Python, check if line ends with colon
-        if self.language == 'python' and stripped_line.endswith(':'):
-            extra_indent = 4
-        # For C-style languages, check if line ends with opening brace
-        elif self.language in ['javascript', 'java', 'cpp', 'c', 'csharp'] and stripped_line.endswith('{'):
-            extra_indent = 4
-        
-        # Insert newline
-        self.text_widget.insert(cursor_pos, '\n')
-        
-        # Insert indentation
-        total_indent = indent + extra_indent
-        if total_indent > 0:
-            self.text_widget.insert("insert", ' ' * total_indent)
-        
+                indent = structure.indent_of(open_text) + self.INDENT_WIDTH
+        else:
+            # Continuation lines of a statement indent like its first line
+            start = structure.statement_start(line)
+            indent = structure.indent_of(self.document.get_line(start))
+            stripped_line = before.strip()
+            if self.language == 'python' and stripped_line.endswith(':'):
+                indent += self.INDENT_WIDTH
+            elif self.language == 'python' and stripped_line.split(' ', 1)[0] in self.DEDENT_KEYWORDS:
+                header = structure.enclosing_block(start)
+                indent = structure.indent_of(self.document.get_line(header)) if header else 0
+                
+        self.text_widget.insert(cursor_pos, '\n' + ' ' * indent)
         return "break"  # Prevent default behavior
     
     def on_key_release(self, event):
         """Handle key release for syntax highlighting and autocomplete"""
-        self.highlighter.highlight()
-        self.line_numbers.redraw()
+        self.scheduler.mark_stale('highlight')
+        self.scheduler.mark_stale('analysis')
+        self.scheduler.mark_stale('brackets')
         
-        # Trigger autocomplete on alphanumeric keys
-        if event.char.isalnum() or event.char == '_':
-            self.show_autocomplete()
+        # Trigger autocomplete on alphanumeric keys, and on "." for members
+        if event.char.isalnum() or event.char in ('_', '.'):
+            self.scheduler.mark_stale('completion')
         elif event.keysym in ["BackSpace", "Delete"]:
             # Update autocomplete on deletion
             current_word = self.get_current_word()
             if len(current_word) >= 2:
-                self.show_autocomplete()
+                self.scheduler.mark_stale('completion')
             else:
-                self.autocomplete.hide()
+                self.hide_autocomplete()
         elif event.keysym in ["space", "parenleft", "parenright", "bracketleft", "bracketright", "semicolon", "comma"]:
-            self.autocomplete.hide()
+            self.hide_autocomplete()
+    
+    def hide_autocomplete(self):
+        """Hide the popup and drop any completion still queued"""
+        self.scheduler.cancel('completion')
+        self.completion.cancel()
+        self.autocomplete.hide()
     
     def get_current_word(self):
         """Get the word currently being typed"""
@@ -450,66 +3044,182 @@ class CodeEditor(ctk.CTkFrame):
     
     def get_all_words(self):
         """Get all words from the text for suggestions"""
-        content = self.text_widget.get("1.0", "end-1c")
-        # Extract all words (alphanumeric + underscore)
-        words = set(re.findall(r'\b\w+\b', content))
-        return sorted(words)
+        return sorted(self.word_index.words())
     
     def get_suggestions(self, word):
-        """Get autocomplete suggestions for a word"""
+        """Get autocomplete suggestions for a word, best first.
+        
+        Keywords, builtins, words from the file and names from the rest of
+        the workspace are looked up in sorted prefix indexes and matched as
+        abbreviations, then ranked by how well they match, how often they
+        occur, how recently they were typed and how close to the cursor
+        they appear.
+        """
         if len(word) < 2:  # Only show suggestions for 2+ characters
             return []
+        candidates = self.local_candidates(word)
+        candidates.update(self.workspace_candidates(word, len(candidates)))
+        return self.rank_suggestions(word, candidates)
+    
+    def local_candidates(self, word):
+        """Get {name: abbreviation score} for keywords, builtins and words from the file"""
+        self.word_index.words()  # Fold in stale lines before reading the prefix index
+        completions = Grammar.get(self.language).get_completions()
+        file_words = self.word_index.prefixes
+        candidates = dict.fromkeys(completions.prefixed(word), 1.0)
+        candidates.update((w, 1.0) for w in file_words.prefixed(word) if w != word)
+        if len(candidates) >= self.MAX_SUGGESTIONS:
+            return candidates
+        
+        # Abbreviations, among the names sharing the typed first letter
+        pool = itertools.chain(itertools.islice(file_words.iter_prefixed(word[0]), self.FUZZY_POOL),
+                               completions.iter_prefixed(word[0]))
+        fuzzy = FuzzyMatcher(word).best(pool, self.MAX_SUGGESTIONS, self.FUZZY_BUDGET / 2)
+        candidates.update((w, score) for w, score in fuzzy.items() if w != word and w not in candidates)
+        return candidates
+    
+    def workspace_candidates(self, word, found=0):
+        """Get {name: abbreviation score} for names from other files; safe to call off the Tk thread.
+        
+        Abbreviations are only looked for while the found suggestions from
+        the buffer and these prefix matches do not fill the popup.
+        """
+        if self.workspace is None:
+            return {}
+        candidates = {w: 1.0 for w in self.workspace.prefixed(word, self.WORKSPACE_CANDIDATES) if w != word}
+        if found + len(candidates) >= self.MAX_SUGGESTIONS:
+            return candidates
+        pool = itertools.islice(self.workspace.iter_prefixed(word[0]), self.FUZZY_POOL)
+        fuzzy = FuzzyMatcher(word).best(pool, self.MAX_SUGGESTIONS, self.FUZZY_BUDGET / 2)
+        candidates.update((w, score) for w, score in fuzzy.items() if w != word and w not in candidates)
+        return candidates
+    
+    def rank_suggestions(self, word, candidates):
+        """Order {name: abbreviation score} candidates for word, best first"""
+        candidates = sorted(candidates.items())
+        if len(candidates) <= 1:
+            return [name for name, _ in candidates]
+        
+        counts = self.word_index.words()
+        line = int(self.text_widget.index("insert").split('.')[0])
+        grammar = Grammar.get(self.language)
+        recent = self.word_index.recent
+        edits = self.word_index.edits
+        nearby = self.nearby_words(word, line)
+        folded = word.lower()
+        scope_names = self.analyzer.visible_names(line) if self.language == 'python' else set()
+        
+        def score(item):
+            candidate, quality = item
+            if candidate.lower().startswith(folded):
+                rank = self.MATCH_WEIGHT
+            else:
+                rank = self.MATCH_WEIGHT * quality
+            rank += math.log1p(counts.get(candidate, 0))
+            if candidate in recent:
+                rank += self.RECENCY_WEIGHT / (1 + edits - recent[candidate])
+            if candidate in nearby:
+                rank += self.PROXIMITY_WEIGHT * (1 - nearby[candidate] / (self.PROXIMITY_LINES + 1))
+            if candidate in grammar.names:
+                rank += self.LANGUAGE_WEIGHT
+            if candidate in scope_names:
+                rank += self.SCOPE_WEIGHT
+            if self.workspace is not None and self.workspace.is_definition(candidate):
+                rank += self.DEFINITION_WEIGHT
+            if candidate.startswith(word):
+                rank += self.CASE_WEIGHT
+            return rank
+        
+        # nlargest is stable, so equal scores stay in alphabetical order
+        return [name for name, _ in heapq.nlargest(self.MAX_SUGGESTIONS, candidates, key=score)]
+    
+    def nearby_words(self, prefix, line):
+        """Map the words starting with prefix around a line to their distance from it in lines"""
+        first_line = max(1, line - self.PROXIMITY_LINES)
+        last_line = min(self.document.line_count(), line + self.PROXIMITY_LINES)
+        pattern = re.compile(r'\b' + re.escape(prefix) + r'\w*', re.IGNORECASE)
+        nearby = {}
+        text = self.document.get_lines(first_line, last_line)
+        for number, line_text in enumerate(text.split('\n'), first_line):
+            distance = abs(number - line)
+            for w in pattern.findall(line_text):
+                if distance < nearby.get(w, sys.maxsize):
+                    nearby[w] = distance
+        return nearby
+    
+    def get_member_suggestions(self, word):
+        """Get the names matching word after "name." or in an import in Python, or None elsewhere"""
+        if self.language != 'python':
+            return None
+        line, col = map(int, self.text_widget.index("insert").split('.'))
+        before = self.text_widget.get(f"{line}.0", f"{line}.{col - len(word)}")
+        members = self.context_names(before, line)
+        if members is None:
+            return None
         
-        suggestions = set()
-        
-        # Add language keywords
-        keywords = self.highlighter.get_keywords()
-        for keyword in keywords:
-            if keyword.lower().startswith(word.lower()):
-                suggestions.add(keyword)
-        
-        # Add words from current file
-        all_words = self.get_all_words()
-        for w in all_words:
-            if w.lower().startswith(word.lower()) and w != word:
-                suggestions.add(w)
-        
-        # Add common built-in functions for Python
+        folded = word.lower()
+        matches = [m for m in members if m.lower().startswith(folded) and m != word
+                   and (word.startswith('_') or not m.startswith('_'))]
+        # Exact-case prefix matches first, then alphabetical
+        return sorted(matches, key=lambda m: (not m.startswith(word), m.lower()))[:self.MAX_SUGGESTIONS]
+    
+    def context_names(self, before, line):
+        """Get the names that may follow the text before the word on a line, or None if any may"""
+        packages = PackageIndex.get()
+        if self.IMPORT_PATTERN.match(before):
+            return packages.module_names()
+        match = self.FROM_IMPORT_PATTERN.match(before)
+        if match is not None:
+            return packages.members(match.group(1))
+        match = re.search(r'(\w+)\.$', before)
+        if match is None:
+            return None
+        receiver = match.group(1)
+        members = self.analyzer.members(receiver, line)
+        if members is not None:
+            return members
+        
+        # An installed module, under the name it was imported as
+        summary = self.analyzer.summary
+        if summary is not None and receiver in summary['imports']:
+            return packages.members(summary['imports'][receiver])
+        if receiver in self.analyzer.visible_names(line):
+            return None
+        return packages.members(receiver)
+    
+    def analyze_source(self):
+        """Send the current Python source to the analyzer"""
         if self.language == 'python':
-            builtins = ['print', 'len', 'range', 'str', 'int', 'float', 'list', 'dict', 'set', 
-                       'tuple', 'open', 'read', 'write', 'input', 'type', 'isinstance', 
-                       'enumerate', 'zip', 'map', 'filter', 'sorted', 'reversed', 'sum', 
-                       'min', 'max', 'abs', 'round', 'pow', 'format', 'split', 'join', 
-                       'append', 'extend', 'insert', 'remove', 'pop', 'index', 'count',
-                       'keys', 'values', 'items', 'get', 'update', 'clear']
-            for builtin in builtins:
-                if builtin.lower().startswith(word.lower()):
-                    suggestions.add(builtin)
-        
-        # Add common JavaScript functions
-        elif self.language == 'javascript':
-            js_funcs = ['console', 'log', 'const', 'let', 'var', 'function', 'return', 
-                       'document', 'getElementById', 'querySelector', 'addEventListener',
-                       'setTimeout', 'setInterval', 'parseInt', 'parseFloat', 'isNaN',
-                       'JSON', 'stringify', 'parse', 'Array', 'Object', 'String', 'Number',
-                       'push', 'pop', 'shift', 'unshift', 'slice', 'splice', 'map', 'filter',
-                       'reduce', 'forEach', 'length', 'indexOf', 'includes']
-            for func in js_funcs:
-                if func.lower().startswith(word.lower()):
-                    suggestions.add(func)
-        
-        return sorted(suggestions)
+            self.analyzer.analyze(self.document.text())
+            
+    def completion_request(self):
+        """Tag completion results with the text version and cursor they were computed for"""
+        return (self.document.version, self.text_widget.index("insert"))
     
     def show_autocomplete(self):
-        """Show autocomplete suggestions"""
+        """Show autocomplete suggestions, adding names from the workspace when they arrive"""
         current_word = self.get_current_word()
+        self.completion.start()
         
+        suggestions = self.get_member_suggestions(current_word)
+        if suggestions is not None:
+            self.display_suggestions(current_word, suggestions)
+            return
         if len(current_word) < 2:
             self.autocomplete.hide()
             return
         
-        suggestions = self.get_suggestions(current_word)
-        
+        # Buffer and language words first; the workspace index is searched in the background
+        candidates = self.local_candidates(current_word)
+        self.display_suggestions(current_word, self.rank_suggestions(current_word, candidates))
+        if self.workspace is not None:
+            def merge(found):
+                candidates.update(found)
+                self.display_suggestions(current_word, self.rank_suggestions(current_word, candidates))
+            self.completion.submit(functools.partial(self.workspace_candidates, current_word, len(candidates)), merge)
+    
+    def display_suggestions(self, word, suggestions):
+        """Show suggestions in the popup under the cursor, or hide it if there are none"""
         if not suggestions:
             self.autocomplete.hide()
             return
@@ -520,24 +3230,437 @@ class CodeEditor(ctk.CTkFrame):
             x = self.text_widget.winfo_rootx() + cursor_bbox[0]
             y = self.text_widget.winfo_rooty() + cursor_bbox[1] + cursor_bbox[3]
             
-            self.autocomplete.show_suggestions(suggestions, current_word, x, y)
+            self.autocomplete.show_suggestions(self.text_widget, suggestions, word, x, y)
         
     def get_text(self):
         """Get text content"""
-        return self.text_widget.get("1.0", "end-1c")
+        return self.document.text()
     
     def set_text(self, content):
         """Set text content"""
         self.text_widget.delete("1.0", "end")
         self.text_widget.insert("1.0", content)
-        self.highlighter.highlight()
+        self.highlighter.highlight_viewport_first()
         self.line_numbers.redraw()
+        self.scheduler.mark_stale('structure')  # Index brackets before the first Return needs them
+        self.scheduler.mark_stale('analysis')
         
     def set_language(self, language):
         """Set programming language"""
         self.language = language
         self.highlighter.set_language(language)
-        self.highlighter.highlight()
+        self.highlighter.highlight_viewport_first()
+        self.structure.set_language(language)
+
+
+class MappedFile:
+    """Read-only memory map of a file with an index of where each line starts.
+    
+    The index is built on a background thread; until it finishes,
+    line_count() covers only the lines found so far. Close it, or use it
+    in a with statement, to release the file and the mapping.
+    """
+    
+    CHUNK_SIZE = 4 * 1024 * 1024  # Bytes scanned for newlines at a time
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.line_starts = array('Q', [0])  # Byte offset of each line
+        self.indexed = 0  # Bytes scanned so far
+        self.done = False
+        self.closed = False
+        threading.Thread(target=self.index_lines, daemon=True).start()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+        
+    def close(self):
+        """Unmap and close the file; the indexing thread stops at its next chunk"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.size:
+            self.map.close()
+        self.file.close()
+        
+    def index_lines(self):
+        """Record the start of every line, a chunk at a time"""
+        starts = self.line_starts
+        for base in range(0, self.size, self.CHUNK_SIZE):
+            try:
+                chunk = self.map[base:base + self.CHUNK_SIZE]
+            except ValueError:
+                return  # Closed while indexing
+            position = chunk.find(b'\n')
+            while position >= 0:
+                starts.append(base + position + 1)
+                position = chunk.find(b'\n', position + 1)
+            self.indexed = base + len(chunk)
+        self.done = True
+        
+    def progress(self):
+        """Get the fraction of the file indexed so far"""
+        return self.indexed / self.size if self.size else 1.0
+    
+    def line_count(self):
+        """Get the number of lines found so far"""
+        return len(self.line_starts)
+    
+    def line_of(self, offset):
+        """Get the line holding a byte offset"""
+        return bisect_right(self.line_starts, offset)
+    
+    def get_lines(self, first, last):
+        """Get lines first..last (1-based, inclusive) as text"""
+        starts = self.line_starts
+        start = starts[first - 1]
+        end = starts[last] - 1 if last < len(starts) else (self.size if self.done else self.indexed)
+        data = self.map[start:max(start, end)].replace(b'\r\n', b'\n')
+        if data.endswith(b'\r'):
+            data = data[:-1]
+        return data.decode('utf-8', errors='replace')
+    
+    def find(self, data, start=0):
+        """Get the byte offset of the next occurrence of data at or after start, or -1"""
+        return self.map.find(data, start)
+    
+    def column_of(self, offset):
+        """Get the character column of a byte offset within its line"""
+        line_start = self.line_starts[self.line_of(offset) - 1]
+        return len(self.map[line_start:offset].decode('utf-8', errors='replace'))
+
+
+class LargeFileViewer(ctk.CTkFrame):
+    """Read-only view of a file too large for the editor.
+    
+    Only a window of lines around the view is held in the Text widget;
+    it is refilled from the memory map as the view nears either edge,
+    while the scrollbar spans the whole file. Find and go to line search
+    the map directly.
+    """
+    
+    WINDOW_LINES = 2000  # Lines held in the Text widget
+    EDGE_LINES = 200  # The window is moved when the view comes this close to its edge
+    POLL_INTERVAL = 200  # Milliseconds between indexing progress updates
+    read_only = True
+    
+    def __init__(self, parent, filename, status=None):
+        super().__init__(parent, fg_color="#1e1e1e")
+        self.file_path = filename
+        self.language = 'text'
+        self.file = MappedFile(filename)
+        self.status = status or (lambda message: None)  # Shows a message in the status bar
+        self.window_start = 1  # File line shown on the first line of the Text widget
+        self.window_lines = 0
+        self.query = None  # Last search, and where to continue it
+        self.search_from = 0
+        self.recentering = False
+        
+        text_frame = ctk.CTkFrame(self, fg_color="#1e1e1e")
+        text_frame.pack(fill="both", expand=True)
+        self.line_numbers = LineNumbers(text_frame, None)
+        self.line_numbers.pack(side="left", fill="y")
+        self.text_widget = tk.Text(
+            text_frame,
+            wrap="none",
+            bg="#1e1e1e",
+            fg="#d4d4d4",
+            insertbackground="white",
+            selectbackground="#264f78",
+            font=("Consolas", 11),
+            undo=False,
+            state="disabled"
+        )
+        self.text_widget.pack(side="left", fill="both", expand=True)
+        self.text_widget.tag_config("match", background="#623315")
+        self.line_numbers.text_widget = self.text_widget
+        self.scrollbar = ttk.Scrollbar(text_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text_widget.config(yscrollcommand=self.on_yscroll)
+        
+        self.text_widget.bind("<Control-f>", lambda e: self.ask_find() or "break")
+        self.text_widget.bind("<F3>", lambda e: self.find_next() or "break")
+        self.text_widget.bind("<Control-g>", lambda e: self.ask_line() or "break")
+        
+        self.load_window(1)
+        self.poll_index()
+        
+    def destroy(self):
+        """Release the memory map along with the tab"""
+        self.file.close()
+        super().destroy()
+        
+    def load_window(self, first):
+        """Fill the Text widget with WINDOW_LINES lines from first, or as close as the file allows"""
+        line_count = self.file.line_count()
+        first = max(1, min(first, line_count - self.WINDOW_LINES + 1))
+        last = min(line_count, first + self.WINDOW_LINES - 1)
+        text = self.file.get_lines(first, last)
+        self.text_widget.configure(state="normal")
+        self.text_widget.delete("1.0", "end")
+        self.text_widget.insert("1.0", text)
+        self.text_widget.configure(state="disabled")
+        self.window_start = first
+        self.window_lines = last - first + 1
+        self.line_numbers.line_offset = first - 1
+        self.line_numbers.redraw()
+        
+    def on_yscroll(self, first, last):
+        """Map the Text widget's view onto the whole file and move the window near its edges"""
+        first, last = float(first), float(last)
+        top = self.window_start - 1 + first * self.window_lines
+        visible = (last - first) * self.window_lines
+        line_count = self.file.line_count()
+        self.scrollbar.set(top / line_count, min(1.0, (top + visible) / line_count))
+        self.line_numbers.redraw()
+        
+        near_top = first * self.window_lines < self.EDGE_LINES and self.window_start > 1
+        near_bottom = ((1 - last) * self.window_lines < self.EDGE_LINES
+                       and self.window_start + self.window_lines - 1 < line_count)
+        if (near_top or near_bottom) and not self.recentering:
+            # Not from inside the Text widget's own scroll callback
+            self.recentering = True
+            self.after_idle(lambda: self.recenter(int(top) + 1))
+            
+    def on_scrollbar(self, action, amount, unit=None):
+        """Scroll through the whole file from the scrollbar"""
+        if action == "moveto":
+            self.show_line(int(float(amount) * self.file.line_count()) + 1)
+        else:
+            self.text_widget.yview_scroll(int(amount), unit)
+            
+    def recenter(self, line):
+        """Reload the window centered on the file line at the top of the view"""
+        self.recentering = False
+        self.load_window(line - self.WINDOW_LINES // 2)
+        self.text_widget.yview(f"{line - self.window_start + 1}.0")
+        
+    def show_line(self, line):
+        """Scroll so a file line is at the top of the view, loading a window around it if needed"""
+        line = max(1, min(line, self.file.line_count()))
+        if not self.window_start <= line < self.window_start + self.window_lines:
+            self.load_window(line - self.WINDOW_LINES // 2)
+        self.text_widget.yview(f"{line - self.window_start + 1}.0")
+        
+    def poll_index(self):
+        """Report indexing progress and extend a window that reached the lines found so far"""
+        if self.file.closed:
+            return
+        if self.window_lines < self.WINDOW_LINES and self.file.line_count() > self.window_start + self.window_lines:
+            top = self.window_start + int(float(self.text_widget.yview()[0]) * self.window_lines)
+            self.load_window(self.window_start)
+            self.text_widget.yview(f"{top - self.window_start + 1}.0")
+        name = os.path.basename(self.file_path)
+        if self.file.done:
+            self.status(f"Opened {name} read-only ({self.file.line_count():,} lines)")
+            return
+        self.status(f"Indexing {name}: {self.file.progress():.0%}")
+        self.after(self.POLL_INTERVAL, self.poll_index)
+        
+    def ask_line(self):
+        """Ask for a line number and go there"""
+        line = simpledialog.askinteger("Go to Line", f"Line (1-{self.file.line_count():,}):", parent=self)
+        if line is not None:
+            self.go_to(line, 0, 0)
+            
+    def ask_find(self):
+        """Ask for text to find and jump to its next occurrence"""
+        query = simpledialog.askstring("Find", "Find:", parent=self, initialvalue=self.query or "")
+        if query:
+            self.query = query
+            top = self.window_start + int(float(self.text_widget.yview()[0]) * self.window_lines)
+            self.search_from = self.file.line_starts[min(top, self.file.line_count()) - 1]
+            self.find_next()
+            
+    def find_next(self):
+        """Jump to the next occurrence of the last search, wrapping at the end of the file"""
+        if not self.query:
+            return
+        data = self.query.encode('utf-8')
+        offset = self.file.find(data, self.search_from)
+        if offset < 0 and self.search_from:
+            offset = self.file.find(data, 0)
+        if offset < 0:
+            self.status(f"'{self.query}' not found")
+            return
+        if offset >= self.file.indexed and not self.file.done:
+            self.status("Still indexing lines, try again in a moment")
+            return
+        self.search_from = offset + len(data)
+        column = self.file.column_of(offset)
+        self.go_to(self.file.line_of(offset), column, len(self.query))
+        
+    def go_to(self, line, column, length):
+        """Show a file line a few rows from the top and select length characters at column"""
+        self.show_line(line - 5)
+        local = line - self.window_start + 1
+        self.text_widget.tag_remove("match", "1.0", "end")
+        if length:
+            self.text_widget.tag_add("match", f"{local}.{column}", f"{local}.{column + length}")
+        self.text_widget.mark_set("insert", f"{local}.{column}")
+        self.text_widget.focus_set()
+        self.status(f"Line {line:,}")
+
+
+class FileLoader:
+    """Streams a file into an editor without blocking Tk.
+    
+    A background thread reads and decodes the file; the Tk side inserts
+    the text in slices from after() callbacks, so the tab is usable and
+    the status bar shows progress while a big file is still arriving.
+    The editor stays read-only until the whole file is in.
+    """
+    
+    SNIFF_SIZE = 64 * 1024  # Bytes looked at to guess the encoding
+    READ_SIZE = 1024 * 1024  # Bytes read and decoded at a time
+    INSERT_CHARS = 256 * 1024  # Characters inserted per Tk turn
+    QUEUED_READS = 8  # Decoded blocks the reader may get ahead of the editor
+    POLL_INTERVAL = 5  # Milliseconds between Tk turns
+    RESTART = object()  # Queued when the reader starts over in another encoding
+    # utf-32 first, its little-endian BOM starts with the utf-16 one
+    BOMS = ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'), (codecs.BOM_UTF8, 'utf-8-sig'),
+            (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+    
+    @classmethod
+    def sniff(cls, head):
+        """Guess a file's encoding from its first bytes, or None if it looks binary"""
+        for bom, encoding in cls.BOMS:
+            if head.startswith(bom):
+                return encoding
+        if b'\0' in head:
+            return None
+        try:
+            head.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # A character cut off at the end of the sample is still UTF-8, unless the sample is the whole file
+            if len(head) < cls.SNIFF_SIZE or e.start < len(head) - 3:
+                return 'latin-1'
+        return 'utf-8'
+    
+    def __init__(self, editor, path, encoding, status):
+        self.editor = editor
+        self.path = path
+        self.encoding = encoding
+        self.status = status  # Shows a message in the status bar
+        self.size = os.path.getsize(path)
+        self.read_bytes = 0
+        self.blocks = queue.Queue(maxsize=self.QUEUED_READS)  # Decoded text, then None or an error
+        self.pending = ''  # Decoded text not inserted yet
+        self.inserted = False
+        self.failed = False
+        editor.read_only = True  # Saving now would write a partial file
+        editor.journal.paused = True  # The load itself is not an undoable edit
+        editor.text_widget.configure(state="disabled")
+        threading.Thread(target=self.read, daemon=True).start()
+        editor.after(self.POLL_INTERVAL, self.poll)
+        
+    def read(self):
+        """Read and decode the file, starting over as Latin-1 if it is not UTF-8 past the sniffed sample"""
+        try:
+            try:
+                self.read_blocks()
+            except UnicodeDecodeError:
+                if self.encoding != 'utf-8':
+                    raise
+                self.encoding = 'latin-1'  # Decodes any bytes, and saves them back unchanged
+                self.blocks.put(self.RESTART)
+                self.read_blocks()
+        except (OSError, UnicodeDecodeError) as e:
+            self.blocks.put(e)
+        self.blocks.put(None)
+        
+    def read_blocks(self):
+        """Decode the file from the start, turning any line endings into \\n"""
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(self.encoding)(), True)
+        self.read_bytes = 0
+        with open(self.path, 'rb') as f:
+            while True:
+                block = f.read(self.READ_SIZE)
+                self.read_bytes += len(block)
+                text = decoder.decode(block, final=not block)
+                if text:
+                    self.blocks.put(text)
+                if not block:
+                    break
+        
+    def poll(self):
+        """Insert the next slice of text, then come back for more"""
+        if not self.editor.winfo_exists():
+            return
+        finished = False
+        while len(self.pending) < self.INSERT_CHARS:
+            try:
+                block = self.blocks.get_nowait()
+            except queue.Empty:
+                break
+            if block is self.RESTART:
+                self.restart()
+                continue
+            if block is None or isinstance(block, Exception):
+                finished = True
+                if block is not None:
+                    self.failed = True
+                    messagebox.showerror("Error", f"Could not finish reading file: {block}")
+                break
+            self.pending += block
+        
+        text, self.pending = self.pending[:self.INSERT_CHARS], self.pending[self.INSERT_CHARS:]
+        if text:
+            self.insert(text)
+        if finished and not self.pending:
+            self.finish()
+            return
+        if self.size:
+            self.status(f"Loading {os.path.basename(self.path)}: {self.read_bytes / self.size:.0%}")
+        self.editor.after(self.POLL_INTERVAL, self.poll)
+        
+    def insert(self, text):
+        """Append text to the editor"""
+        text_widget = self.editor.text_widget
+        text_widget.configure(state="normal")
+        text_widget.insert("end-1c", text)
+        text_widget.configure(state="disabled")
+        if not self.inserted:
+            # Show the top of the file, highlighted, as soon as it arrives
+            self.inserted = True
+            text_widget.mark_set("insert", "1.0")
+            self.editor.highlighter.highlight_viewport_first()
+        else:
+            self.editor.scheduler.mark_stale('highlight')
+            
+    def restart(self):
+        """Drop the text read so far, the reader is decoding the file again"""
+        text_widget = self.editor.text_widget
+        text_widget.configure(state="normal")
+        text_widget.delete("1.0", "end")
+        text_widget.configure(state="disabled")
+        self.pending = ''
+        self.inserted = False
+        self.editor.encoding = self.encoding
+        
+    def finish(self):
+        """Make the editor editable, with the load not on its undo stack"""
+        if self.failed:
+            # Saving a partly read file would cut it short on disk
+            self.status(f"Opened {self.path} read-only, it could not be read completely")
+            return
+        text_widget = self.editor.text_widget
+        self.editor.read_only = False
+        self.editor.journal.paused = False
+        text_widget.configure(state="normal")
+        text_widget.edit_reset()
+        text_widget.edit_modified(False)
+        text_widget.mark_set("insert", "1.0")
+        self.editor.scheduler.mark_stale('gutter')
+        self.editor.scheduler.mark_stale('structure')
+        self.editor.scheduler.mark_stale('analysis')
+        self.status(f"Opened {self.path} ({self.editor.language}, {self.encoding})")
 
 
 class OutputPanel(ctk.CTkTextbox):
@@ -752,6 +3875,799 @@ class FileExplorer(ctk.CTkFrame):
                 messagebox.showerror("Error", f"Could not delete: {str(e)}")
 
 
+class IgnoreRules:
+    """The patterns of one .gitignore file, matched the way git matches them"""
+    
+    def __init__(self, folder, lines):
+        self.folder = folder
+        self.rules = []  # (regex, negated, directories only), later rules win
+        for line in lines:
+            line = line.rstrip('\n\r')
+            if not line.strip() or line.startswith('#'):
+                continue
+            line = line.rstrip(' ')
+            negated = line.startswith('!')
+            if negated or line.startswith('\\'):
+                line = line[1:]
+            directories_only = line.endswith('/')
+            line = line.rstrip('/')
+            anchored = '/' in line
+            pattern = self.translate(line.lstrip('/'))
+            if not anchored:
+                pattern = '(?:.*/)?' + pattern  # Matches at any depth
+            self.rules.append((re.compile(pattern + r'\Z'), negated, directories_only))
+            
+    @classmethod
+    def read(cls, folder):
+        """Get the rules of folder/.gitignore, or None if it has none"""
+        try:
+            with open(os.path.join(folder, '.gitignore'), 'r', encoding='utf-8', errors='replace') as f:
+                rules = cls(folder, f.readlines())
+        except OSError:
+            return None
+        return rules if rules.rules else None
+    
+    @staticmethod
+    def translate(glob):
+        """Convert a gitignore glob to a regex over '/'-separated paths"""
+        parts = []
+        i = 0
+        while i < len(glob):
+            if glob.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+            elif glob.startswith('**', i):
+                parts.append('.*')
+                i += 2
+            elif glob[i] == '*':
+                parts.append('[^/]*')
+                i += 1
+            elif glob[i] == '?':
+                parts.append('[^/]')
+                i += 1
+            elif glob[i] == '[' and ']' in glob[i + 2:]:
+                end = glob.index(']', i + 2)
+                body = glob[i + 1:end].replace('\\', '\\\\')
+                parts.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+                i = end + 1
+            else:
+                parts.append(re.escape(glob[i]))
+                i += 1
+        return ''.join(parts)
+    
+    def match(self, path, is_dir):
+        """Get True if the path is ignored, False if re-included, None if no rule applies"""
+        relative = os.path.relpath(path, self.folder).replace(os.sep, '/')
+        result = None
+        for regex, negated, directories_only in self.rules:
+            if (is_dir or not directories_only) and regex.match(relative):
+                result = not negated
+        return result
+    
+    @classmethod
+    def walk(cls, root_path, stopped=lambda: False):
+        """Yield the files under a folder that its .gitignore files do not exclude, and not .git"""
+        folders = [(root_path, [])]
+        while folders and not stopped():
+            folder, rules = folders.pop()
+            own = cls.read(folder)
+            if own is not None:
+                rules = rules + [own]
+            try:
+                with os.scandir(folder) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            subfolders = []
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name == '.git':
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if not is_dir and not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                ignored = False
+                for ruleset in rules:
+                    matched = ruleset.match(entry.path, is_dir)
+                    if matched is not None:
+                        ignored = matched
+                if ignored:
+                    continue
+                if is_dir:
+                    subfolders.append((entry.path, rules))
+                else:
+                    yield entry.path
+            folders.extend(reversed(subfolders))
+
+
+@functools.lru_cache(maxsize=8)
+def compile_search(pattern, literal, ignore_case):
+    """Compile a search; a case-sensitive literal is searched for in the raw bytes with find.
+    
+    Regexes are compiled for text and run on the decoded file, so . and
+    character classes match whole characters, and ^ and $ match at every
+    line. An ignore-case literal stays a bytes regex while it is ASCII.
+    """
+    if literal and not ignore_case:
+        return pattern.encode('utf-8')
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    if literal and pattern.isascii():
+        return re.compile(re.escape(pattern).encode('utf-8'), flags)
+    return re.compile(re.escape(pattern) if literal else pattern, flags)
+
+
+def search_files(paths, pattern, literal, ignore_case, max_matches):
+    """Search a batch of files; runs in a worker process.
+    
+    Returns (path, [(line, column, length, line text), ...]) for each file
+    that matched, skipping files that look binary.
+    """
+    search = compile_search(pattern, literal, ignore_case)
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                if not os.fstat(f.fileno()).st_size:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    matches = search_mapped(data, search, max_matches)
+        except (OSError, ValueError):
+            continue
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+def search_mapped(data, search, max_matches):
+    """Find up to max_matches matches of a compiled search in a memory-mapped file"""
+    if b'\0' in data[:FileSearch.BINARY_SNIFF]:
+        return None
+    newline, decode = b'\n', lambda piece: piece.decode('utf-8', errors='replace')
+    if isinstance(getattr(search, 'pattern', b''), str):
+        data = data[:].decode('utf-8', errors='replace')
+        newline, decode = '\n', str
+    if isinstance(search, bytes):
+        spans = []
+        start = data.find(search)
+        while start >= 0 and len(spans) < max_matches:
+            spans.append((start, start + len(search)))
+            start = data.find(search, start + len(search))
+    else:
+        spans = (match.span() for match in search.finditer(data))
+        
+    matches = []
+    line, counted = 1, 0  # Newlines are counted up to offset counted
+    for start, end in spans:
+        if start == end:
+            continue  # An empty match, e.g. of ^ or a*, marks nothing
+        line += data[counted:start].count(newline)
+        counted = start
+        line_start = data.rfind(newline, 0, start) + 1
+        line_end = data.find(newline, start)
+        if line_end < 0:
+            line_end = len(data)
+        text = data[line_start:min(line_end, line_start + FileSearch.MAX_LINE_BYTES)]
+        matches.append((line, len(decode(data[line_start:start])), len(decode(data[start:end])),
+                        decode(text).rstrip('\r')))
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+
+class FileSearch:
+    """One find-in-files query over a folder, run on a pool of worker processes.
+    
+    A dispatcher thread walks the folder, skipping .git and whatever the
+    .gitignore files exclude, and hands files to the workers in batches
+    that start small, so the first matches come back quickly, and grow
+    so every core stays busy. With a TrigramIndex only the files it
+    names as candidates are read. Matches are queued for the Tk thread,
+    and cancel() stops the walk and drops whatever is still in flight.
+    """
+    
+    pool = None  # Worker processes shared by all searches
+    workers = os.cpu_count() or 1
+    FIRST_BATCH = 8  # Files in the first batch; each batch doubles up to MAX_BATCH
+    MAX_BATCH = 256
+    IN_FLIGHT = 2  # Batches queued per worker
+    MAX_MATCHES = 1000  # Matches reported per file
+    MAX_LINE_BYTES = 300  # Longest line text reported with a match
+    BINARY_SNIFF = 8192  # Bytes checked for a NUL to spot binary files
+    
+    def __init__(self, root_path, pattern, literal=True, ignore_case=True, index=None):
+        self.root_path = os.path.abspath(root_path)
+        self.arguments = (pattern, literal, ignore_case, self.MAX_MATCHES)
+        self.index = index  # TrigramIndex narrowing the files to read, if any
+        self.indexed = False  # Only the index's candidate files were searched
+        self.results = queue.Queue()  # Lists of (path, matches), then None once finished
+        self.cancelled = False
+        threading.Thread(target=self.run, daemon=True).start()
+        
+    @classmethod
+    def get_pool(cls):
+        """Get the worker process pool, falling back to threads where processes are unavailable"""
+        if cls.pool is None:
+            try:
+                cls.pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=cls.workers, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, ValueError, NotImplementedError):
+                cls.pool = concurrent.futures.ThreadPoolExecutor(max_workers=cls.workers)
+        return cls.pool
+    
+    @classmethod
+    def warm_up(cls):
+        """Start every worker now, so the first search does not wait for them"""
+        pool = cls.get_pool()
+        for _ in range(cls.workers):
+            pool.submit(int)
+            
+    def cancel(self):
+        """Stop the search; nothing more is queued after the current results"""
+        self.cancelled = True
+        
+    @classmethod
+    def submit(cls, function, *args):
+        """Run function(*args) on the pool"""
+        try:
+            return cls.get_pool().submit(function, *args)
+        except RuntimeError:
+            # A worker process died; work on threads from now on
+            FileSearch.pool = concurrent.futures.ThreadPoolExecutor(max_workers=cls.workers)
+            return cls.pool.submit(function, *args)
+        
+    def run(self):
+        """Walk the folder, keep the workers fed and pass their results on"""
+        running = set()
+        batch, size = [], self.FIRST_BATCH
+        try:
+            paths = None
+            if self.index is not None:
+                paths = self.index.candidates(*self.arguments[:2])
+                self.indexed = paths is not None
+            if paths is None:
+                paths = IgnoreRules.walk(self.root_path, lambda: self.cancelled)
+            for path in paths:
+                if self.cancelled:
+                    break
+                batch.append(path)
+                if len(batch) < size:
+                    continue
+                running.add(self.submit(search_files, batch, *self.arguments))
+                batch, size = [], min(size * 2, self.MAX_BATCH)
+                running = self.collect(running, self.workers * self.IN_FLIGHT)
+            if batch and not self.cancelled:
+                running.add(self.submit(search_files, batch, *self.arguments))
+            self.collect(running, 1)
+        finally:
+            for future in running:
+                future.cancel()
+            self.results.put(None)
+            
+    def collect(self, running, limit):
+        """Pass on finished batches, waiting while limit or more are still running"""
+        while running and not self.cancelled:
+            wait = None if len(running) >= limit else 0
+            done, running = concurrent.futures.wait(
+                running, timeout=wait, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    found = future.result()
+                except Exception:
+                    continue  # A failing batch only loses its own matches
+                if found and not self.cancelled:
+                    self.results.put(found)
+            if not done and wait == 0:
+                break
+        return running
+
+
+def index_trigrams(paths, max_size):
+    """Get the trigrams of a batch of files for a TrigramIndex; runs in a worker process.
+    
+    Returns (path, mtime, size, kind, trigrams) per readable file, where
+    kind is 'text', 'binary' or 'large' and trigrams are the sorted
+    trigram keys of the lower-cased text as array('I') bytes.
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size > max_size:
+                    results.append((path, stat.st_mtime, stat.st_size, 'large', b''))
+                    continue
+                data = f.read()
+        except OSError:
+            continue
+        if b'\0' in data[:FileSearch.BINARY_SNIFF]:
+            results.append((path, stat.st_mtime, stat.st_size, 'binary', b''))
+            continue
+        # Every 4-byte word at each of the four alignments covers every trigram;
+        # dropping the last byte of each distinct word gives the trigram keys
+        data = data.lower() + b'\0\0\0'
+        words = set()
+        for start in range(4):
+            words.update(memoryview(data)[start:start + (len(data) - start) // 4 * 4].cast('I'))
+        if sys.byteorder == 'little':
+            keys = {word & 0xFFFFFF for word in words}
+        else:
+            keys = {word >> 8 for word in words}
+        results.append((path, stat.st_mtime, stat.st_size, 'text', array('I', sorted(keys)).tobytes()))
+    return results
+
+
+class TrigramIndex:
+    """On-disk trigram index of a folder, so searches only read files that can match.
+    
+    For every lower-cased three-byte sequence the index lists the files
+    that contain it, as delta-varint encoded file numbers. The literal
+    parts of a query give trigrams every match must contain; intersecting
+    their lists leaves the candidate files, which are then searched for
+    real. The index is built in the background and kept current from file
+    mtimes: changed files are appended under new numbers, and everything
+    is re-indexed once too many numbers are stale.
+    """
+    
+    instances = {}  # Root folder -> index
+    CACHE_DIR = WorkspaceIndex.CACHE_DIR
+    MAGIC = b'IDETRI01'
+    HEADER = struct.Struct('<8sIQ')  # Magic, trigram count, length of the compressed file table
+    MAX_FILE_SIZE = 16 * 1024 * 1024  # Larger files are not indexed and always searched
+    BATCH = 64  # Files per worker batch
+    RESCAN_INTERVAL = 5.0  # Seconds after a scan before a search triggers another
+    MAX_STALE = 0.25  # Share of stale file numbers that triggers a full re-index
+    # Python 3.11 added possessive repeats
+    REPEATS = {getattr(regex_constants, name, None) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')}
+    ATOMIC_GROUP = getattr(regex_constants, 'ATOMIC_GROUP', None)
+    
+    def __init__(self, root_path):
+        self.root_path = os.path.abspath(root_path)
+        name = hashlib.sha1(self.root_path.encode('utf-8')).hexdigest()
+        self.cache_path = self.CACHE_DIR / f"trigrams-{name}.bin"
+        # (files, keys, offsets, map, base, large), replaced whole under the lock
+        self.state = None
+        self.map = None  # Memory map of the cache file
+        self.lock = threading.Lock()
+        self.saved = set()  # Paths saved since the last scan, searched whatever the index says
+        self.scan_requested = threading.Event()
+        self.last_scan = 0
+        self.scanned = False  # The index has been checked against the files since it was loaded
+        threading.Thread(target=self.run, daemon=True).start()
+        
+    @classmethod
+    def get(cls, root_path):
+        """Get the index of a folder, starting to build it the first time"""
+        root_path = os.path.abspath(root_path)
+        index = cls.instances.get(root_path)
+        if index is None:
+            index = cls.instances[root_path] = cls(root_path)
+        return index
+    
+    @classmethod
+    def file_saved(cls, path):
+        """Note a file the editor wrote, so searches look at it before the next scan"""
+        path = os.path.abspath(path)
+        for root_path, index in list(cls.instances.items()):
+            if path.startswith(root_path + os.sep):
+                index.saved.add(path)
+                index.scan_requested.set()
+                
+    def run(self):
+        """Load the cache, then bring it up to date whenever a scan is requested"""
+        self.load()
+        while True:
+            try:
+                self.update()
+                self.scanned = True
+            except Exception:
+                pass  # Searches fall back to reading every file
+            self.last_scan = time.monotonic()
+            self.scan_requested.wait()
+            self.scan_requested.clear()
+            
+    def candidates(self, pattern, literal):
+        """Get the paths of the files that can match a search, or None if the index cannot tell"""
+        if time.monotonic() - self.last_scan > self.RESCAN_INTERVAL:
+            self.scan_requested.set()
+        keys = self.query_trigrams(pattern, literal)
+        if not keys or not self.scanned:
+            return None  # Files may have changed while the IDE was closed
+        with self.lock:
+            if self.state is None:
+                return None
+            files, trigrams, offsets, data, base, large = self.state
+            lists = []
+            for key in keys:
+                i = bisect_left(trigrams, key)
+                if i == len(trigrams) or trigrams[i] != key:
+                    lists = None  # No file has this trigram
+                    break
+                lists.append((offsets[i + 1] - offsets[i], i))
+            numbers = set()
+            if lists:
+                # Shortest lists first, so the set shrinks as early as possible
+                lists.sort()
+                numbers = None
+                for _, i in lists:
+                    found = self.decode(data[base + offsets[i]:base + offsets[i + 1]])
+                    numbers = set(found) if numbers is None else numbers.intersection(found)
+                    if not numbers:
+                        break
+        paths = [os.path.join(self.root_path, files[number][0])
+                 for number in sorted(numbers) + large if files[number] is not None]
+        seen = set(paths)
+        return paths + [path for path in list(self.saved) if path not in seen]
+    
+    def query_trigrams(self, pattern, literal):
+        """Get the trigram keys every match of a search must contain"""
+        runs = [pattern] if literal else self.required_literals(pattern)
+        keys = set()
+        for run in runs or ():
+            data = run.encode('utf-8').lower()
+            # Only ASCII is case-folded in the index, so other letters may be stored in another case
+            keys.update(int.from_bytes(data[i:i + 3], sys.byteorder) for i in range(len(data) - 2)
+                        if data[i:i + 3].isascii())
+        return keys
+    
+    @classmethod
+    def required_literals(cls, pattern):
+        """Get literal strings every match of a regex contains, or None if that cannot be worked out"""
+        if regex_parser is None:
+            return None
+        try:
+            runs = []
+            runs.append(cls.collect_literals(regex_parser.parse(pattern), runs, ''))
+        except Exception:
+            # Besides bad or too deeply nested patterns, the private parser's output may differ by version
+            return None
+        return [run for run in runs if len(run.encode('utf-8')) >= 3]
+    
+    @classmethod
+    def collect_literals(cls, items, runs, run):
+        """Add the literal runs of parsed regex items to runs, and return the run still open after them.
+        
+        Only text every match must contain is collected: alternatives,
+        optional parts, classes and escapes such as \\w end the run, and
+        a group or repeat contributes only what it always matches.
+        """
+        for op, argument in items:
+            if op == regex_constants.LITERAL:
+                run += chr(argument)
+            elif op == regex_constants.SUBPATTERN:
+                run = cls.collect_literals(argument[-1], runs, run)  # Matched exactly once
+            elif op == cls.ATOMIC_GROUP:
+                run = cls.collect_literals(argument, runs, run)
+            elif op in cls.REPEATS and argument[0] >= 1:
+                inner = argument[2]
+                if all(inner_op == regex_constants.LITERAL for inner_op, _ in inner):
+                    # One or more copies of text: it ends the run before and starts the one after
+                    text = ''.join(chr(code) for _, code in inner)
+                    runs.append(run + text)
+                    run = text
+                else:
+                    runs.append(run)
+                    runs.append(cls.collect_literals(inner, runs, ''))
+                    run = ''
+            else:
+                runs.append(run)
+                run = ''
+        return run
+    
+    @staticmethod
+    def encode(numbers, last=0):
+        """Delta-varint encode ascending file numbers that follow last"""
+        out = bytearray()
+        for number in numbers:
+            delta = number - last
+            last = number
+            while delta >= 0x80:
+                out.append(delta & 0x7F | 0x80)
+                delta >>= 7
+            out.append(delta)
+        return bytes(out)
+    
+    @staticmethod
+    def decode(data):
+        """Decode a delta-varint list of file numbers"""
+        if not data or max(data) < 0x80:
+            return list(itertools.accumulate(data))  # Every delta fits in one byte
+        numbers = []
+        number = value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                number += value
+                numbers.append(number)
+                value = shift = 0
+        return numbers
+    
+    def update(self):
+        """Re-index the files whose mtime or size changed, and save the index"""
+        with self.lock:
+            state = self.state
+        saved = set(self.saved)
+        files = list(state[0]) if state else []
+        known = {entry[0]: number for number, entry in enumerate(files) if entry is not None}
+        changed = False
+        paths, unchanged = [], []
+        for path in IgnoreRules.walk(self.root_path):
+            relative = os.path.relpath(path, self.root_path)
+            number = known.pop(relative, None)
+            if number is not None:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entry = files[number]
+                if entry[1] == stat.st_mtime and entry[2] == stat.st_size and path not in saved:
+                    unchanged.append(path)  # Only read again on a full re-index
+                    continue
+                files[number] = None
+            paths.append(path)
+        for number in known.values():
+            files[number] = None  # Deleted or now ignored
+        if not paths and not known:
+            self.saved -= saved
+            return
+        
+        added = {}  # Trigram key -> new file numbers
+        if files.count(None) > self.MAX_STALE * len(files):
+            files, paths, state = [], paths + unchanged, None
+        batches = [paths[i:i + self.BATCH] for i in range(0, len(paths), self.BATCH)]
+        running = set()
+        while batches or running:
+            while batches and len(running) < FileSearch.workers * FileSearch.IN_FLIGHT:
+                running.add(FileSearch.submit(index_trigrams, batches.pop(0), self.MAX_FILE_SIZE))
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for path, mtime, size, kind, data in future.result():
+                    number = len(files)
+                    files.append([os.path.relpath(path, self.root_path), mtime, size, kind])
+                    keys = array('I')
+                    keys.frombytes(data)
+                    for key in keys:
+                        numbers = added.get(key)
+                        if numbers is None:
+                            added[key] = array('I', [number])
+                        else:
+                            numbers.append(number)
+        self.save(files, state, added)
+        self.saved -= saved
+        
+    def save(self, files, state, added):
+        """Write the old postings with the new numbers appended, then switch to the new file"""
+        old_keys, old_offsets = (state[1], state[2]) if state else (array('I'), array('Q', [0]))
+        keys = sorted(set(old_keys).union(added))
+        offsets = array('Q', [0])
+        table = zlib.compress(json.dumps({'root': self.root_path, 'files': files}).encode('utf-8'))
+        temp_path = self.cache_path.with_suffix('.tmp')
+        self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, 'wb') as out:
+            out.write(self.HEADER.pack(self.MAGIC, len(keys), len(table)))
+            out.write(table)
+            offsets_at = out.tell() + 4 * len(keys)
+            out.write(array('I', keys).tobytes())
+            out.write(bytes(8 * (len(keys) + 1)))  # Offsets, filled in below
+            i = 0
+            for key in keys:
+                part = b''
+                while i < len(old_keys) and old_keys[i] < key:
+                    i += 1
+                if i < len(old_keys) and old_keys[i] == key:
+                    _, _, _, data, base, _ = state
+                    part = data[base + old_offsets[i]:base + old_offsets[i + 1]]
+                if key in added:
+                    previous = self.decode(part)
+                    part += self.encode(added[key], previous[-1] if previous else 0)
+                out.write(part)
+                offsets.append(offsets[-1] + len(part))
+            out.seek(offsets_at)
+            out.write(offsets.tobytes())
+        with self.lock:
+            if self.map is not None:
+                self.map.close()  # Windows cannot replace a mapped file
+                self.map = None
+                self.state = None
+            os.replace(temp_path, self.cache_path)
+            self.load_locked()
+            
+    def load(self):
+        with self.lock:
+            self.load_locked()
+            
+    def load_locked(self):
+        """Map the cache file and read its tables, if it is a usable index of this root"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        try:
+            magic, count, table_size = self.HEADER.unpack_from(data)
+            position = self.HEADER.size
+            table = json.loads(zlib.decompress(data[position:position + table_size]))
+            position += table_size
+            if magic != self.MAGIC or table.get('root') != self.root_path:
+                raise ValueError("not an index of this folder")
+            keys, offsets = array('I'), array('Q')
+            keys.frombytes(data[position:position + 4 * count])
+            position += 4 * count
+            offsets.frombytes(data[position:position + 8 * (count + 1)])
+            position += 8 * (count + 1)
+        except (ValueError, struct.error, zlib.error):
+            data.close()
+            return
+        files = table['files']
+        large = [number for number, entry in enumerate(files) if entry is not None and entry[3] == 'large']
+        self.map = data
+        self.state = (files, keys, offsets, data, position, large)
+
+
+class SearchPanel(ctk.CTkFrame):
+    """Find in files: searches the explorer's folder as you type and lists the matches"""
+    
+    DEBOUNCE = 60  # Milliseconds of typing pause before a search starts
+    POLL_INTERVAL = 15  # Milliseconds between checks for new results
+    ROWS_PER_POLL = 400  # Matches added to the list per check, to keep typing responsive
+    MAX_RESULTS = 5000  # The search stops after this many matches
+    
+    def __init__(self, parent, get_root, on_open):
+        super().__init__(parent, fg_color=VSCODE_COLORS['bg_darker'])
+        self.get_root = get_root  # Callable giving the folder to search
+        self.on_open = on_open  # Called with (path, line, column, length) for a chosen match
+        self.search = None
+        self.pending = None  # After id of a debounced search
+        self.poll_id = None
+        self.backlog = []  # (path, matches) received but not shown yet
+        self.finished = False  # The search has sent all its results
+        self.locations = {}  # Tree item -> (path, line, column, length)
+        self.match_count = 0
+        self.file_count = 0
+        self.started = 0
+        
+        title = ctk.CTkLabel(self, text="SEARCH", font=("Segoe UI", 11, "bold"),
+                             text_color=VSCODE_COLORS['text_primary'], anchor="w")
+        title.pack(fill="x", padx=10, pady=5)
+        
+        self.query = ctk.CTkEntry(self, placeholder_text="Search")
+        self.query.pack(fill="x", padx=5)
+        self.query.bind("<KeyRelease>", self.on_query_changed)
+        self.query.bind("<Return>", lambda e: self.start_search())
+        
+        options = ctk.CTkFrame(self, fg_color="transparent")
+        options.pack(fill="x", padx=5, pady=5)
+        self.match_case = ctk.BooleanVar(value=False)
+        self.use_regex = ctk.BooleanVar(value=False)
+        self.use_index = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(options, text="Aa", width=60, variable=self.match_case,
+                        command=self.start_search).pack(side="left")
+        ctk.CTkCheckBox(options, text=".*", width=60, variable=self.use_regex,
+                        command=self.start_search).pack(side="left")
+        ctk.CTkCheckBox(options, text="Index", width=60, variable=self.use_index,
+                        command=self.start_search).pack(side="left")
+        
+        self.status = ctk.CTkLabel(self, text="", font=("Segoe UI", 10), anchor="w",
+                                   text_color=VSCODE_COLORS['text_primary'])
+        self.status.pack(fill="x", padx=10)
+        
+        self.tree = ttk.Treeview(self, selectmode='browse', show='tree')
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<Return>", self.on_double_click)
+        
+    def focus_query(self):
+        """Put the cursor in the search box, with its text selected"""
+        FileSearch.warm_up()
+        if self.use_index.get():
+            TrigramIndex.get(self.get_root())  # Build or refresh it while the query is typed
+        self.query.focus_set()
+        self.query.select_range(0, "end")
+        
+    def on_query_changed(self, event):
+        if event.keysym == "Return":
+            return
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+        self.pending = self.after(self.DEBOUNCE, self.start_search)
+        
+    def start_search(self):
+        """Cancel the running search and start one for the current query"""
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+            self.pending = None
+        self.stop()
+        self.tree.delete(*self.tree.get_children())
+        self.locations = {}
+        self.backlog = []
+        self.finished = False
+        self.match_count = self.file_count = 0
+        
+        query = self.query.get()
+        if not query:
+            self.status.configure(text="")
+            return
+        literal = not self.use_regex.get()
+        ignore_case = not self.match_case.get()
+        if not literal:
+            try:
+                compile_search(query, literal, ignore_case)
+            except re.error as e:
+                self.status.configure(text=f"Invalid pattern: {e}")
+                return
+        self.status.configure(text="Searching...")
+        self.started = time.perf_counter()
+        index = TrigramIndex.get(self.get_root()) if self.use_index.get() else None
+        self.search = FileSearch(self.get_root(), query, literal, ignore_case, index)
+        if self.poll_id is None:
+            self.poll_id = self.after(self.POLL_INTERVAL, self.poll)
+            
+    def stop(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+            
+    def poll(self):
+        """Move newly found matches from the search into the list"""
+        self.poll_id = None
+        search = self.search
+        if search is None:
+            return
+        while not self.finished:
+            try:
+                found = search.results.get_nowait()
+            except queue.Empty:
+                break
+            if found is None:
+                self.finished = True
+            else:
+                self.backlog.extend(found)
+            
+        shown = 0
+        while self.backlog and shown < self.ROWS_PER_POLL and self.match_count < self.MAX_RESULTS:
+            path, matches = self.backlog.pop(0)
+            matches = matches[:self.MAX_RESULTS - self.match_count]
+            self.add_file(search.root_path, path, matches)
+            shown += len(matches)
+        if self.match_count >= self.MAX_RESULTS:
+            search.cancel()
+            self.backlog = []
+            self.finished = True
+            
+        elapsed = time.perf_counter() - self.started
+        summary = f"{self.match_count:,} results in {self.file_count:,} files"
+        if self.finished and not self.backlog:
+            self.search = None
+            if self.match_count >= self.MAX_RESULTS:
+                summary = f"First {summary} (refine the search to see more)"
+            if search.indexed:
+                summary += ", indexed"
+            self.status.configure(text=f"{summary} ({elapsed:.2f}s)" if self.match_count else "No results")
+            return
+        self.status.configure(text=f"{summary}...")
+        self.poll_id = self.after(self.POLL_INTERVAL, self.poll)
+        
+    def add_file(self, root_path, path, matches):
+        """Add a file and its matches to the list"""
+        self.file_count += 1
+        self.match_count += len(matches)
+        relative = os.path.relpath(path, root_path)
+        node = self.tree.insert("", "end", text=f"📄 {relative} ({len(matches)})", open=True)
+        self.locations[node] = (path, matches[0][0], matches[0][1], matches[0][2])
+        for line, column, length, text in matches:
+            item = self.tree.insert(node, "end", text=f"{line}: {text.strip()}")
+            self.locations[item] = (path, line, column, length)
+            
+    def on_double_click(self, event):
+        """Open the chosen match"""
+        selection = self.tree.selection()
+        if selection and selection[0] in self.locations:
+            self.on_open(*self.locations[selection[0]])
+
+
 class Terminal(ctk.CTkFrame):
     """Integrated terminal widget"""
     
@@ -1015,6 +4931,8 @@ class ActivityBar(ctk.CTkFrame):
 class IDEApp(ctk.CTk):
     """Main IDE Application - VS Code Style"""
     
+    LARGE_FILE_SIZE = 64 * 1024 * 1024  # Bigger files open read-only in a LargeFileViewer
+    
     def __init__(self):
         super().__init__()
         
@@ -1027,6 +4945,7 @@ class IDEApp(ctk.CTk):
         self.running_process = None
         self.editors = []  # List of editor tabs
         self.explorer_visible = True
+        self.search_visible = False  # The sidebar shows the search panel instead of the explorer
         self.terminal_visible = False
         
         # Create UI
@@ -1034,6 +4953,9 @@ class IDEApp(ctk.CTk):
         self.create_main_layout()
         self.create_statusbar()
         
+        # Index the open folder in the background for cross-file completion
+        self.workspace = WorkspaceIndex(self.file_explorer.root_path)
+        
         # Create first editor tab
         self.new_file()
         
@@ -1046,7 +4968,7 @@ class IDEApp(ctk.CTk):
             'toggle_explorer': self.toggle_explorer,
             'run': self.run_code,
             'toggle_terminal': self.toggle_terminal,
-            'search': lambda: messagebox.showinfo("Search", "Search feature coming soon!"),
+            'search': self.toggle_search,
             'settings': lambda: messagebox.showinfo("Settings", "Settings coming soon!")
         }
         self.activity_bar = ActivityBar(self, callbacks)
@@ -1061,6 +4983,36 @@ class IDEApp(ctk.CTk):
             self.sidebar_frame.pack(side="left", fill="y", after=self.activity_bar)
             self.explorer_visible = True
     
+    def toggle_search(self):
+        """Show the search panel in the sidebar, or switch back to the explorer"""
+        if self.search_visible and self.explorer_visible:
+            self.search_panel.pack_forget()
+            self.explorer_title.pack(fill="x", padx=5, pady=5)
+            self.file_explorer.pack(fill="both", expand=True, padx=5, pady=5)
+            self.search_visible = False
+            return
+        if not self.explorer_visible:
+            self.toggle_explorer()
+        self.explorer_title.pack_forget()
+        self.file_explorer.pack_forget()
+        self.search_panel.pack(fill="both", expand=True)
+        self.search_panel.focus_query()
+        self.search_visible = True
+        
+    def open_location(self, path, line, column, length):
+        """Open a file, or switch to its tab, and select a match in it"""
+        for index, editor in enumerate(self.editors):
+            if editor.file_path and os.path.abspath(editor.file_path) == os.path.abspath(path):
+                self.notebook.select(index)
+                break
+        else:
+            count = len(self.editors)
+            self.load_file(path)
+            if len(self.editors) == count:
+                return  # It could not be opened
+            editor = self.editors[-1]
+        editor.go_to(line, column, length)
+        
     def toggle_terminal(self):
         """Toggle terminal visibility"""
         if self.terminal_visible:
@@ -1091,9 +5043,14 @@ class IDEApp(ctk.CTk):
         # Create file explorer first (but don't pack yet)
         self.file_explorer = FileExplorer(self.sidebar_frame, self.load_file)
         
+        # Search panel, shown in place of the explorer
+        self.search_panel = SearchPanel(self.sidebar_frame, lambda: self.file_explorer.root_path,
+                                        self.open_location)
+        
         # Explorer title with buttons (pack this first)
         explorer_title = ctk.CTkFrame(self.sidebar_frame, fg_color=VSCODE_COLORS['bg_darker'], height=35)
         explorer_title.pack(fill="x", padx=5, pady=5)
+        self.explorer_title = explorer_title
         
         title_label = ctk.CTkLabel(
             explorer_title, 
@@ -1329,28 +5286,12 @@ class IDEApp(ctk.CTk):
         self.bind("<Shift-F5>", lambda e: self.stop_process())
         self.bind("<Control-b>", lambda e: self.build_project())
         self.bind("<Control-grave>", lambda e: self.toggle_terminal())  # Ctrl+` (backtick) for terminal
+        self.bind("<Control-Shift-F>", lambda e: self.toggle_search())
         
     def detect_language(self, filename):
         """Detect programming language from file extension"""
-        ext_map = {
-            '.py': 'python', '.pyw': 'python',
-            '.js': 'javascript', '.jsx': 'javascript',
-            '.ts': 'typescript', '.tsx': 'typescript',
-            '.java': 'java',
-            '.cpp': 'cpp', '.cc': 'cpp', '.cxx': 'cpp',
-            '.c': 'c',
-            '.cs': 'csharp',
-            '.rb': 'ruby',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.php': 'php',
-            '.html': 'html', '.htm': 'html',
-            '.css': 'css',
-            '.sql': 'sql',
-            '.sh': 'bash',
-        }
         ext = os.path.splitext(filename)[1].lower()
-        return ext_map.get(ext, 'python')
+        return LANGUAGE_EXTENSIONS.get(ext, 'python')
         
     def get_current_editor(self):
         """Get currently active editor"""
@@ -1362,7 +5303,7 @@ class IDEApp(ctk.CTk):
             
     def new_file(self):
         """Create new file tab"""
-        editor = CodeEditor(self.notebook)
+        editor = CodeEditor(self.notebook, workspace=self.workspace)
         self.editors.append(editor)
         self.notebook.add(editor, text="Untitled")
         self.notebook.select(len(self.editors) - 1)
@@ -1380,13 +5321,20 @@ class IDEApp(ctk.CTk):
     def load_file(self, filename):
         """Load file into editor"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if os.path.getsize(filename) > self.LARGE_FILE_SIZE:
+                self.open_large_file(filename)
+                return
+            
+            with open(filename, 'rb') as f:
+                encoding = FileLoader.sniff(f.read(FileLoader.SNIFF_SIZE))
+            if encoding is None:
+                messagebox.showerror("Error", f"{os.path.basename(filename)} looks like a binary file")
+                return
             
             language = self.detect_language(filename)
-            editor = CodeEditor(self.notebook, language)
+            editor = CodeEditor(self.notebook, language, self.workspace)
             editor.file_path = filename
-            editor.set_text(content)
+            editor.encoding = encoding
             
             self.editors.append(editor)
             tab_name = os.path.basename(filename)
@@ -1395,20 +5343,36 @@ class IDEApp(ctk.CTk):
             
             self.current_file = filename
             self.title(f"VS Code IDE - {filename}")
-            self.update_statusbar(f"Opened {filename} ({language})")
+            
+            # The text streams in after the tab is showing
+            FileLoader(editor, filename, encoding, self.update_statusbar)
         except Exception as e:
             messagebox.showerror("Error", f"Could not open file: {str(e)}")
             
+    def open_large_file(self, filename):
+        """Open a file too large for the editor in a read-only viewer tab"""
+        viewer = LargeFileViewer(self.notebook, filename, self.update_statusbar)
+        self.editors.append(viewer)
+        self.notebook.add(viewer, text=f"{os.path.basename(filename)} (read-only)")
+        self.notebook.select(len(self.editors) - 1)
+        self.current_file = filename
+        self.title(f"VS Code IDE - {filename}")
+        
     def save_file(self):
         """Save current file"""
         editor = self.get_current_editor()
         if not editor:
             return
+        if getattr(editor, 'read_only', False):
+            self.update_statusbar(f"{os.path.basename(editor.file_path)} is open read-only")
+            return
             
         if hasattr(editor, 'file_path') and editor.file_path:
             try:
-                with open(editor.file_path, 'w', encoding='utf-8') as f:
+                with open(editor.file_path, 'w', encoding=editor.encoding) as f:
                     f.write(editor.get_text())
+                self.workspace.refresh(editor.file_path)
+                TrigramIndex.file_saved(editor.file_path)
                 self.update_statusbar(f"Saved {editor.file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Could not save file: {str(e)}")
@@ -1418,7 +5382,7 @@ class IDEApp(ctk.CTk):
     def save_file_as(self):
         """Save file with new name"""
         editor = self.get_current_editor()
-        if not editor:
+        if not editor or getattr(editor, 'read_only', False):
             return
             
         filename = filedialog.asksaveasfilename(
@@ -1429,9 +5393,11 @@ class IDEApp(ctk.CTk):
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
+                with open(filename, 'w', encoding=editor.encoding) as f:
                     f.write(editor.get_text())
                 editor.file_path = filename
+                self.workspace.refresh(filename)
+                TrigramIndex.file_saved(filename)
                 
                 tab_index = self.editors.index(editor)
                 self.notebook.tab(tab_index, text=os.path.basename(filename))
@@ -0,0 +1,787 @@
+"""Benchmarks for the editor hot paths of app_ctk.py
+
+Generates synthetic Python/C++/Java/JavaScript files and measures how
+syntax highlighting, the line number gutter, autocomplete suggestions and
+auto-indentation scale with file size. Runs headlessly: with a real (hidden)
+Tk text widget when a display is available (e.g. under Xvfb), otherwise with
+a stub text widget that implements the subset of the Tk text command the
+editor uses. Results are written as JSON so runs can be compared.
+
+Usage:
+    python bench_ctk.py                         # all languages, default sizes
+    python bench_ctk.py --sizes 1000 20000 --languages python
+    python bench_ctk.py --output new.json --compare old.json
+    python bench_ctk.py --identifiers 0         # skip the 100k identifier case
+"""
+
+import argparse
+import gc
+import heapq
+import json
+import os
+import platform
+import random
+import re
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import app_ctk
+
+
+DEFAULT_SIZES = [1000, 10000, 50000, 200000]
+LANGUAGES = ['python', 'cpp', 'java', 'javascript']
+VIEWPORT_LINES = 40
+
+
+# ---------------------------------------------------------------------------
+# Synthetic corpora
+# ---------------------------------------------------------------------------
+
+WORDS = ['value', 'count', 'index', 'buffer', 'result', 'item', 'node', 'total', 'offset',
+         'config', 'handler', 'request', 'response', 'cache', 'state', 'parser', 'token',
+         'widget', 'stream', 'record', 'entry', 'source', 'target', 'filter', 'matrix']
+
+
+def make_name(rng, camel=False):
+    """Make a random identifier"""
+    parts = rng.sample(WORDS, rng.randint(1, 3))
+    if camel:
+        return parts[0] + ''.join(p.capitalize() for p in parts[1:])
+    return '_'.join(parts)
+
+
+def make_identifier(rng, camel=False):
+    """Make an identifier from random letters, so names spread over all prefixes"""
+    parts = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 7)))
+             for _ in range(rng.randint(1, 3))]
+    if camel:
+        return parts[0] + ''.join(p.capitalize() for p in parts[1:])
+    return '_'.join(parts)
+
+
+def python_block(rng):
+    """Generate one Python function or class"""
+    name = make_name(rng)
+    lines = []
+    if rng.random() < 0.3:
+        lines.append(f"class {name.title().replace('_', '')}:")
+        lines.append('    """' + ' '.join(rng.sample(WORDS, 6)))
+        lines.append('    spanning two lines."""')
+        indent = '    '
+    else:
+        indent = ''
+    lines.append(f"{indent}def {name}(self, {make_name(rng)}, {make_name(rng)}=None):")
+    lines.append(f"{indent}    # {' '.join(rng.sample(WORDS, 5))}")
+    for _ in range(rng.randint(3, 12)):
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(f"{indent}    {make_name(rng)} = {rng.randint(0, 9999)} + {make_name(rng)}")
+        elif kind < 0.5:
+            lines.append(f"{indent}    if {make_name(rng)} in ('{rng.choice(WORDS)}', \"{rng.choice(WORDS)}\"):")
+            lines.append(f"{indent}        return {make_name(rng)}({rng.random():.3f})")
+        elif kind < 0.7:
+            lines.append(f"{indent}    for {make_name(rng)} in range(len({make_name(rng)})):")
+            lines.append(f"{indent}        print({make_name(rng)}, end='')")
+        else:
+            lines.append(f"{indent}    {make_name(rng)}.{make_name(rng)}({make_name(rng)}, {rng.randint(0, 99)})")
+    lines.append('')
+    return lines
+
+
+def c_like_block(rng, language):
+    """Generate one C++/Java/JavaScript function"""
+    camel = language != 'cpp'
+    name = make_name(rng, camel)
+    var = 'let' if language == 'javascript' else 'int'
+    lines = ['/* ' + ' '.join(rng.sample(WORDS, 6)), ' * ' + ' '.join(rng.sample(WORDS, 4)) + ' */']
+    if language == 'javascript':
+        lines.append(f"function {name}({make_name(rng, camel)}, {make_name(rng, camel)}) {{")
+    elif language == 'java':
+        lines.append(f"    public static int {name}(int {make_name(rng, camel)}, String {make_name(rng, camel)}) {{")
+    else:
+        lines.append(f"static int {name}(int {make_name(rng)}, const char* {make_name(rng)}) {{")
+    for _ in range(rng.randint(3, 12)):
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(f"    {var} {make_name(rng, camel)} = {rng.randint(0, 9999)} + {make_name(rng, camel)};")
+        elif kind < 0.5:
+            lines.append(f"    if ({make_name(rng, camel)} == \"{rng.choice(WORDS)}\") {{")
+            lines.append(f"        return {make_name(rng, camel)}({rng.random():.3f});")
+            lines.append("    }")
+        elif kind < 0.7:
+            lines.append(f"    for ({var} i = 0; i < {rng.randint(1, 100)}; i++) {{  // {rng.choice(WORDS)}")
+            lines.append(f"        {make_name(rng, camel)}[i] = {make_name(rng, camel)}(i);")
+            lines.append("    }")
+        else:
+            lines.append(f"    {make_name(rng, camel)}.{make_name(rng, camel)}({make_name(rng, camel)}, {rng.randint(0, 99)});")
+    lines.append("}")
+    lines.append('')
+    return lines
+
+
+def generate_source(language, line_count, seed=0):
+    """Generate a deterministic synthetic source file of about line_count lines"""
+    rng = random.Random(f"{language}-{line_count}-{seed}")
+    lines = []
+    while len(lines) < line_count:
+        if language == 'python':
+            lines.extend(python_block(rng))
+        else:
+            lines.extend(c_like_block(rng, language))
+    return '\n'.join(lines[:line_count])
+
+
+# ---------------------------------------------------------------------------
+# Stub Tk text widget
+# ---------------------------------------------------------------------------
+
+class StubTk:
+    """Minimal Tcl interpreter: just a table of commands"""
+
+    def __init__(self):
+        self.commands = {}
+
+    def call(self, *args):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        if args[0] == "rename":
+            self.commands[args[2]] = self.commands.pop(args[1])
+            return ""
+        return self.commands[args[0]](*args[1:])
+
+    def createcommand(self, name, func):
+        self.commands[name] = func
+
+
+class EventLoop:
+    """Stand-in for the Tk event loop that runs after() callbacks in order"""
+
+    def __init__(self):
+        self.queue = []
+        self.cancelled = set()
+        self.counter = 0
+
+    def after(self, delay, func):
+        self.counter += 1
+        heapq.heappush(self.queue, (time.perf_counter() + delay / 1000, self.counter, func))
+        return f"after#{self.counter}"
+
+    def after_cancel(self, after_id):
+        self.cancelled.add(int(after_id.split('#')[1]))
+
+    def run_one(self):
+        """Run the next due callback, waiting for it if needed; False when empty"""
+        while self.queue:
+            due, counter, func = heapq.heappop(self.queue)
+            if counter in self.cancelled:
+                self.cancelled.discard(counter)
+                continue
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            func()
+            return True
+        return False
+
+
+class StubText:
+    """Pure-Python stand-in for tk.Text covering what the editor uses"""
+
+    INDEX_RE = re.compile(r'^(end|insert|current|@-?\d+,-?\d+|\d+\.(?:\d+|end))')
+    MODIFIER_RE = re.compile(r'\s*(?:([+-])\s*(\d+)\s*(c|chars|l|lines|line)\b|(linestart|lineend))')
+
+    def __init__(self, loop, height=VIEWPORT_LINES):
+        self.loop = loop
+        self.lines = ['']
+        self.marks = {'insert': (1, 0)}
+        self.height = height
+        self.top_line = 1
+        self.tag_calls = 0
+        self.tk = StubTk()
+        self._w = f".stubtext{id(self)}"
+        self.tk.createcommand(self._w, self.command)
+
+    # --- Tcl level widget command -----------------------------------------
+
+    def command(self, operation, *args):
+        return getattr(self, 'cmd_' + operation)(*args)
+
+    def position(self, index, allow_end=False):
+        """Resolve an index to a clamped (line, column) pair"""
+        index = str(index)
+        match = self.INDEX_RE.match(index)
+        base = match.group(1)
+        past_end = base == 'end'  # "end" is one character past the last one
+        if past_end:
+            line, column = len(self.lines), len(self.lines[-1])
+        elif base in self.marks:
+            line, column = self.marks[base]
+        elif base[0] == '@':
+            y = int(base[1:].split(',')[1])
+            line, column = self.top_line + max(0, y) // 15, 0
+        else:
+            line_text, column_text = base.split('.')
+            line = int(line_text)
+            column = None if column_text == 'end' else int(column_text)
+            if 1 <= line <= len(self.lines):
+                column = len(self.lines[line - 1]) if column is None else column
+            else:
+                column = 0
+        if allow_end and line > len(self.lines) and not past_end:
+            return len(self.lines) + 1, 0
+        line, column = self.clamp(line, column)
+        for sign, count, unit, anchor in self.MODIFIER_RE.findall(index[match.end():]):
+            if anchor == 'linestart':
+                column = 0
+            elif anchor == 'lineend':
+                column = len(self.lines[line - 1])
+            elif unit.startswith('l'):
+                line += int(count) if sign == '+' else -int(count)
+                if line > len(self.lines):
+                    # Like Tk, stepping past the last line lands on the undisplayed end line
+                    if allow_end:
+                        return len(self.lines) + 1, 0
+                    line, column = len(self.lines), len(self.lines[-1])
+                    past_end = True
+                    continue
+                line = min(max(line, 1), len(self.lines))
+                column = min(column, len(self.lines[line - 1]))
+            else:
+                count = int(count) if sign == '+' else -int(count)
+                if past_end and count < 0:
+                    count += 1
+                line, column = self.move_chars(line, column, count)
+            past_end = False
+        return line, column
+
+    def clamp(self, line, column):
+        if line < 1:
+            return 1, 0
+        if line > len(self.lines):
+            return len(self.lines), len(self.lines[-1])
+        return line, min(max(column, 0), len(self.lines[line - 1]))
+
+    def move_chars(self, line, column, count):
+        column += count
+        while column < 0 and line > 1:
+            line -= 1
+            column += len(self.lines[line - 1]) + 1
+        while column > len(self.lines[line - 1]) and line < len(self.lines):
+            column -= len(self.lines[line - 1]) + 1
+            line += 1
+        return self.clamp(line, column)
+
+    def cmd_index(self, index):
+        line, column = self.position(index, allow_end=True)
+        return f"{line}.{column}"
+
+    def cmd_get(self, start, end=None):
+        (l1, c1) = self.position(start)
+        if end is None:
+            text = self.lines[l1 - 1]
+            return text[c1] if c1 < len(text) else '\n'
+        (l2, c2) = self.position(end)
+        if (l2, c2) < (l1, c1):
+            return ''
+        if l1 == l2:
+            return self.lines[l1 - 1][c1:c2]
+        return '\n'.join([self.lines[l1 - 1][c1:]] + self.lines[l1:l2 - 1] + [self.lines[l2 - 1][:c2]])
+
+    def cmd_insert(self, index, chars, *tags):
+        line, column = self.position(index)
+        text = self.lines[line - 1]
+        new_lines = (text[:column] + chars + text[column:]).split('\n')
+        self.lines[line - 1:line] = new_lines
+        if self.marks['insert'] >= (line, column):
+            self.marks['insert'] = self.move_chars(line, column, len(chars))
+        return ""
+
+    def cmd_delete(self, start, end=None):
+        l1, c1 = self.position(start)
+        l2, c2 = self.position(end) if end is not None else self.move_chars(l1, c1, 1)
+        if (l2, c2) <= (l1, c1):
+            return ""
+        self.lines[l1 - 1:l2] = [self.lines[l1 - 1][:c1] + self.lines[l2 - 1][c2:]]
+        self.marks['insert'] = self.clamp(*min(self.marks['insert'], (l1, c1)))
+        return ""
+
+    def cmd_mark(self, operation, name, index=None):
+        if operation == 'set':
+            self.marks[name] = self.position(index)
+        return ""
+
+    def cmd_tag(self, operation, *args):
+        self.tag_calls += 1
+        return ""
+
+    def cmd_dlineinfo(self, index):
+        line, _ = self.position(index, allow_end=True)
+        if self.top_line <= line < self.top_line + self.height and line <= len(self.lines):
+            return (0, (line - self.top_line) * 15, 400, 15, 12)
+        return None
+
+    def cmd_bbox(self, index):
+        line, column = self.position(index)
+        return (column * 8, (line - self.top_line) * 15, 8, 15)
+
+    def cmd_compare(self, first, op, second):
+        return {'<': lambda a, b: a < b, '<=': lambda a, b: a <= b, '==': lambda a, b: a == b,
+                '>=': lambda a, b: a >= b, '>': lambda a, b: a > b, '!=': lambda a, b: a != b}[op](
+            self.position(first), self.position(second))
+
+    def cmd_edit(self, *args):
+        return ""
+
+    def cmd_cget(self, option):
+        return "normal" if option == "-state" else ""
+
+    def cmd_see(self, index):
+        line, _ = self.position(index)
+        if not self.top_line <= line < self.top_line + self.height:
+            self.top_line = max(1, line - self.height // 2)
+        return ""
+
+    # --- Python level tkinter.Text API --------------------------------------
+
+    def call(self, *args):
+        return self.tk.call((self._w,) + args)
+
+    def index(self, index):
+        return str(self.call('index', index))
+
+    def get(self, start, end=None):
+        return self.call('get', start, end) if end is not None else self.call('get', start)
+
+    def insert(self, index, chars, *args):
+        return self.call('insert', index, chars, *args)
+
+    def delete(self, start, end=None):
+        return self.call('delete', start, end) if end is not None else self.call('delete', start)
+
+    def mark_set(self, name, index):
+        return self.call('mark', 'set', name, index)
+
+    def tag_add(self, tag, *indices):
+        return self.call('tag', 'add', tag, *indices)
+
+    def tag_remove(self, tag, start, end=None):
+        return self.call('tag', 'remove', tag, start, end)
+
+    def tag_config(self, *args, **kwargs):
+        pass
+
+    def dlineinfo(self, index):
+        return self.call('dlineinfo', index)
+
+    def bbox(self, index):
+        return self.call('bbox', index)
+
+    def compare(self, first, op, second):
+        return self.call('compare', first, op, second)
+
+    def see(self, index):
+        return self.call('see', index)
+
+    def cget(self, option):
+        return self.height if option == 'height' else ''
+
+    def winfo_height(self):
+        return self.height * 15
+
+    def after(self, delay, func=None):
+        return self.loop.after(delay, func)
+
+    def after_idle(self, func):
+        return self.loop.after(0, func)
+
+    def after_cancel(self, after_id):
+        self.loop.after_cancel(after_id)
+
+    def scroll_to(self, line):
+        self.top_line = max(1, line)
+
+
+class StubCanvas:
+    """Canvas stand-in for the line number gutter"""
+
+    def __init__(self, text_widget):
+        self.text_widget = text_widget
+        self.created = 0
+
+    def delete(self, *args):
+        pass
+
+    def create_text(self, *args, **kwargs):
+        self.created += 1
+        return self.created
+
+    def coords(self, item, *args):
+        pass
+
+    def itemconfigure(self, item, **kwargs):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+
+def borrow_methods(target, source):
+    """Copy the methods and class attributes of source onto target so they run on stand-ins"""
+    for name, value in vars(source).items():
+        if not name.startswith('__') and name not in vars(target):
+            setattr(target, name, value)
+
+
+class BenchGutter(StubCanvas):
+    """LineNumbers logic running on a stub canvas"""
+
+    def __init__(self, text_widget):
+        super().__init__(text_widget)
+        self.digit_width = 8
+        self.items = []
+        self.rows = []
+        self.shown = None
+        self.digits = 0
+        self.line_offset = 0
+
+
+class BenchEditor:
+    """CodeEditor logic running on a stub (or hidden real) text widget"""
+
+    def __init__(self, text_widget, language, gutter):
+        self.language = language
+        self.file_path = None
+        self.text_widget = text_widget
+        self.line_numbers = gutter
+        self.document = app_ctk.Document()
+        self.word_index = app_ctk.WordIndex(self.document)
+        self.structure = app_ctk.StructureIndex(self.document, language)
+        self.journal = app_ctk.UndoJournal(text_widget)
+        self.workspace = None
+        self.analyzer = app_ctk.PythonAnalyzer(text_widget)
+        self.highlighter = app_ctk.SyntaxHighlighter(text_widget, self.document, language)
+        self.install_edit_hook()
+        self.scheduler = app_ctk.EditScheduler(text_widget)
+        self.scheduler.add_job('highlight', self.highlighter.highlight_dirty, self.JOB_DELAYS['highlight'])
+        self.scheduler.add_job('gutter', self.line_numbers.redraw, self.JOB_DELAYS['gutter'])
+        self.scheduler.add_job('structure', self.structure.refresh, self.JOB_DELAYS['structure'])
+
+    def load(self, content):
+        """Like CodeEditor.set_text, minus the widget plumbing"""
+        self.text_widget.delete("1.0", "end")
+        self.text_widget.insert("1.0", content)
+        self.highlighter.highlight_viewport_first()
+        self.scheduler.mark_stale('structure')
+
+    def is_idle(self):
+        highlighter = self.highlighter
+        return (highlighter.job_reply is None and highlighter.apply_job is None
+                and not highlighter.unhighlighted and not self.scheduler.pending)
+
+
+borrow_methods(BenchGutter, app_ctk.LineNumbers)
+borrow_methods(BenchEditor, app_ctk.CodeEditor)
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+class Harness:
+    """Creates editors and drives the event loop for the stub or a real Tk"""
+
+    def __init__(self, use_tk):
+        self.root = None
+        self.loop = None
+        if use_tk:
+            import tkinter as tk
+            self.root = tk.Tk()
+            self.root.withdraw()
+            self.mode = 'tk'
+        else:
+            self.loop = EventLoop()
+            self.mode = 'stub'
+
+    def make_editor(self, language):
+        if self.root is not None:
+            import tkinter as tk
+            text_widget = tk.Text(self.root, height=VIEWPORT_LINES, wrap="none")
+            gutter = app_ctk.LineNumbers(self.root, text_widget)
+            return BenchEditor(text_widget, language, gutter)
+        text_widget = StubText(self.loop)
+        return BenchEditor(text_widget, language, BenchGutter(text_widget))
+
+    def scroll_to(self, editor, line):
+        if self.root is not None:
+            editor.text_widget.yview(f"{line}.0")
+        else:
+            editor.text_widget.scroll_to(line)
+
+    def pump(self, until, timeout=120.0):
+        """Process events until until() is true"""
+        deadline = time.perf_counter() + timeout
+        while not until():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("benchmark timed out waiting for the editor")
+            if self.root is not None:
+                self.root.update()
+                time.sleep(0.0005)
+            elif not self.loop.run_one():
+                time.sleep(0.0005)
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+
+
+def percentiles(samples):
+    """Summarize latency samples (seconds) in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        'samples': len(ordered),
+        'p50_ms': round(pick(0.50), 4),
+        'p90_ms': round(pick(0.90), 4),
+        'p99_ms': round(pick(0.99), 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4),
+    }
+
+
+def bench_open(harness, language, content):
+    """Time to first visible highlight and to full highlight after loading"""
+    editor = harness.make_editor(language)
+    start = time.perf_counter()
+    editor.load(content)
+    viewport_done = lambda: not any(r[0] <= VIEWPORT_LINES for r in editor.highlighter.unhighlighted)
+    harness.pump(lambda: viewport_done() or editor.is_idle())
+    first_paint = time.perf_counter() - start
+    harness.pump(editor.is_idle)
+    full = time.perf_counter() - start
+    return editor, {'first_paint_ms': round(first_paint * 1000, 3), 'full_highlight_ms': round(full * 1000, 3)}
+
+
+def bench_memory(harness, language, content):
+    """Python heap used by loading and highlighting one document"""
+    gc.collect()
+    tracemalloc.start()
+    editor = harness.make_editor(language)
+    editor.load(content)
+    harness.pump(editor.is_idle)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'retained_mb': round(current / 2**20, 3), 'peak_mb': round(peak / 2**20, 3)}
+
+
+def bench_keystrokes(harness, editor, rng, count):
+    """Per-keystroke latency of typing a character and re-highlighting"""
+    samples = []
+    line_count = int(editor.text_widget.index("end-1c").split('.')[0])
+    for _ in range(count):
+        line = rng.randint(1, line_count)
+        harness.scroll_to(editor, max(1, line - VIEWPORT_LINES // 2))
+        start = time.perf_counter()
+        editor.text_widget.insert(f"{line}.end", rng.choice(['x', ' ', '(', '"', '#']))
+        editor.scheduler.mark_stale('highlight')
+        harness.pump(editor.is_idle)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_gutter(harness, editor, rng, count):
+    """Latency of one line number gutter redraw at random scroll positions"""
+    samples = []
+    line_count = int(editor.text_widget.index("end-1c").split('.')[0])
+    for _ in range(count):
+        harness.scroll_to(editor, rng.randint(1, line_count))
+        start = time.perf_counter()
+        editor.line_numbers.redraw()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_suggestions(editor, rng, content, count):
+    """Latency of computing autocomplete suggestions for typed prefixes"""
+    words = sorted(set(re.findall(r'\b[A-Za-z_]\w{2,}\b', content)))
+    samples = []
+    for _ in range(count):
+        word = rng.choice(words)
+        prefix = word[:rng.randint(2, min(4, len(word)))]
+        start = time.perf_counter()
+        editor.get_suggestions(prefix)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_identifiers(harness, count, total):
+    """Latency of autocomplete suggestions with total distinct names in the file and as many in the workspace
+
+    Half the queries are prefixes and half are abbreviations that match
+    no name as a prefix, so abbreviation matching runs on both sources.
+    """
+    rng = random.Random(f"bench-identifiers-{total}")
+    names = set()
+    while len(names) < 2 * total:
+        names.add(make_identifier(rng, camel=len(names) % 2 == 0))
+    names = sorted(names)
+    rng.shuffle(names)
+    local, others = names[:total], names[total:]
+    editor = harness.make_editor('python')
+    editor.load(''.join(f"{name} = 0\n" for name in local))
+    harness.pump(editor.is_idle)
+    # The workspace index with its files already read, holding the other names
+    workspace = app_ctk.WorkspaceIndex.__new__(app_ctk.WorkspaceIndex)
+    workspace.symbols = (app_ctk.PrefixIndex(others), app_ctk.PrefixIndex(), frozenset(others))
+    editor.workspace = workspace
+
+    samples = []
+    for i in range(count):
+        name = rng.choice(names)
+        if i % 2:
+            query = ''.join(part[0] for part in re.findall(r'[A-Za-z][a-z]*', name)).lower()
+            query = query if len(query) >= 2 else name[:2]
+        else:
+            query = name[:rng.randint(2, 4)]
+        start = time.perf_counter()
+        editor.get_suggestions(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_auto_indent(harness, editor, rng, count):
+    """Latency of auto_indent (the Return key) at random line ends"""
+    samples = []
+    line_count = int(editor.text_widget.index("end-1c").split('.')[0])
+    for _ in range(count):
+        line = rng.randint(1, line_count)
+        editor.text_widget.mark_set("insert", f"{line}.end")
+        start = time.perf_counter()
+        editor.auto_indent()
+        samples.append(time.perf_counter() - start)
+        harness.pump(editor.is_idle)
+    return samples
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def display_available():
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        return False
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+
+def run(args):
+    use_tk = {'tk': True, 'stub': False}.get(args.widget, None)
+    if use_tk is None:
+        use_tk = display_available()
+    harness = Harness(use_tk)
+    results = []
+    try:
+        for language in args.languages:
+            for size in args.sizes:
+                rng = random.Random(f"bench-{language}-{size}")
+                content = generate_source(language, size)
+                editor, open_times = bench_open(harness, language, content)
+                entry = {'language': language, 'lines': size, 'bytes': len(content.encode('utf-8'))}
+                entry.update(open_times)
+                entry['keystroke_highlight'] = percentiles(bench_keystrokes(harness, editor, rng, args.keystrokes))
+                entry['gutter_redraw'] = percentiles(bench_gutter(harness, editor, rng, args.keystrokes))
+                entry['get_suggestions'] = percentiles(bench_suggestions(editor, rng, content, args.keystrokes))
+                entry['auto_indent'] = percentiles(bench_auto_indent(harness, editor, rng, args.keystrokes))
+                if not args.no_memory:
+                    entry['memory'] = bench_memory(harness, language, content)
+                results.append(entry)
+                print(f"{language:>10} {size:>7} lines  open {entry['full_highlight_ms']:>9.1f} ms  "
+                      f"key p50/p99 {entry['keystroke_highlight']['p50_ms']:.2f}/"
+                      f"{entry['keystroke_highlight']['p99_ms']:.2f} ms  "
+                      f"suggest p50 {entry['get_suggestions']['p50_ms']:.2f} ms", flush=True)
+        identifiers = None
+        if args.identifiers:
+            identifiers = percentiles(bench_identifiers(harness, args.keystrokes, args.identifiers))
+            print(f"{args.identifiers} identifiers  suggest p50/p99 {identifiers['p50_ms']:.2f}/"
+                  f"{identifiers['p99_ms']:.2f} ms", flush=True)
+    finally:
+        harness.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'widget': harness.mode,
+            'keystrokes': args.keystrokes,
+        },
+        'results': results,
+        'identifiers': {'names': args.identifiers, 'get_suggestions': identifiers} if identifiers else None,
+    }
+
+
+def compare(current, baseline_path):
+    """Print p50/p99 ratios of this run against an earlier result file"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['language'], r['lines']): r for r in baseline['results']}
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('revision')}); ratio > 1 is slower")
+    for entry in current['results']:
+        before = old.get((entry['language'], entry['lines']))
+        if before is None:
+            continue
+        cells = []
+        for metric in ('keystroke_highlight', 'gutter_redraw', 'get_suggestions', 'auto_indent'):
+            if metric in before:
+                for stat in ('p50_ms', 'p99_ms'):
+                    ratio = entry[metric][stat] / before[metric][stat] if before[metric][stat] else float('inf')
+                    cells.append(f"{metric}.{stat[:3]} x{ratio:.2f}")
+        if before.get('full_highlight_ms'):
+            cells.append(f"open x{entry['full_highlight_ms'] / before['full_highlight_ms']:.2f}")
+        print(f"{entry['language']:>10} {entry['lines']:>7}: " + ", ".join(cells))
+    now, before = current.get('identifiers'), baseline.get('identifiers')
+    if now and before and now['names'] == before['names']:
+        cells = [f"get_suggestions.{stat[:3]} x{now['get_suggestions'][stat] / before['get_suggestions'][stat]:.2f}"
+                 for stat in ('p50_ms', 'p99_ms') if before['get_suggestions'][stat]]
+        print(f"{now['names']:>10} identifiers: " + ", ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app_ctk editor hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="file sizes in lines")
+    parser.add_argument('--languages', nargs='+', default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument('--keystrokes', type=int, default=100, help="samples per latency measurement")
+    parser.add_argument('--widget', choices=['auto', 'tk', 'stub'], default='auto',
+                        help="real hidden Tk text widget (needs a display/Xvfb) or the stub")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--identifiers', type=int, default=100000,
+                        help="distinct names for the large-vocabulary suggestion case (0 skips it)")
+    parser.add_argument('--output', default='bench_output.json', help="where to write the JSON results")
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier JSON result file to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Tests for opening files: encodings and the large file map (run with python -m unittest test_loader)"""
+
+import codecs
+import os
+import queue
+import tempfile
+import time
+import unittest
+
+from app_ctk import FileLoader, MappedFile
+
+
+class SniffTest(unittest.TestCase):
+    """The encoding guessed from the first bytes of a file"""
+
+    def test_small_latin1_file_is_not_utf8(self):
+        self.assertEqual(FileLoader.sniff(b'caf\xe9'), 'latin-1')
+        self.assertEqual(FileLoader.sniff(b'x = "\xe9"\n'), 'latin-1')
+
+    def test_character_cut_off_by_the_sample(self):
+        head = (b'a' * FileLoader.SNIFF_SIZE + 'é'.encode('utf-8'))[:FileLoader.SNIFF_SIZE]
+        self.assertEqual(FileLoader.sniff(head), 'utf-8')
+        self.assertEqual(FileLoader.sniff('café'.encode('utf-8')), 'utf-8')
+
+    def test_boms_and_binary(self):
+        self.assertEqual(FileLoader.sniff('x'.encode('utf-16')), 'utf-16')
+        self.assertIsNone(FileLoader.sniff(b'\x00\x01\x02'))
+
+
+class ReadTest(unittest.TestCase):
+    """Decoding the whole file on the reader thread"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def read(self, data, encoding):
+        path = os.path.join(self.folder.name, 'sample.txt')
+        with open(path, 'wb') as f:
+            f.write(data)
+        loader = FileLoader.__new__(FileLoader)
+        loader.path, loader.encoding, loader.blocks = path, encoding, queue.Queue()
+        loader.read()
+        blocks = []
+        while True:
+            block = loader.blocks.get_nowait()
+            if block is None:
+                return loader.encoding, blocks
+            blocks.append(block)
+
+    def test_utf8_file(self):
+        self.assertEqual(self.read('café\r\n'.encode('utf-8'), 'utf-8'), ('utf-8', ['café\n']))
+
+    def test_invalid_utf8_after_the_sample_starts_over_as_latin1(self):
+        data = b'a' * (FileLoader.READ_SIZE + 10) + b'caf\xe9\n'
+        encoding, blocks = self.read(data, 'utf-8')
+        self.assertEqual(encoding, 'latin-1')
+        restart = blocks.index(FileLoader.RESTART)
+        self.assertEqual(''.join(blocks[restart + 1:]).encode('latin-1'), data)
+
+    def test_invalid_bytes_in_other_encodings_are_an_error(self):
+        encoding, blocks = self.read(codecs.BOM_UTF16_LE + b'a\x00\x00\xd8', 'utf-16')
+        self.assertEqual(encoding, 'utf-16')
+        self.assertIsInstance(blocks[-1], UnicodeDecodeError)
+        self.assertNotIn('�', ''.join(b for b in blocks if isinstance(b, str)))
+
+
+class MappedFileTest(unittest.TestCase):
+    """The memory map behind the large file viewer"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'big.log')
+        with open(self.path, 'wb') as f:
+            f.write(b''.join(b'line %d\r\n' % i for i in range(1, 1001)))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_lines_and_close(self):
+        with MappedFile(self.path) as mapped:
+            deadline = time.monotonic() + 10
+            while not mapped.done:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+            self.assertEqual(mapped.get_lines(2, 3), 'line 2\nline 3')
+            self.assertEqual(mapped.line_of(mapped.find(b'line 500')), 500)
+        self.assertTrue(mapped.file.closed)
+        self.assertTrue(mapped.map.closed)
+        mapped.close()  # A second close does nothing
+
+
+if __name__ == '__main__':
+    unittest.main()
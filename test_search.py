@@ -0,0 +1,192 @@
+"""Tests for find in files and its trigram index (run with python -m unittest test_search)"""
+
+import concurrent.futures
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import app_ctk
+from app_ctk import FileSearch, TrigramIndex, search_files
+
+
+def run_search(root, pattern, literal=True, ignore_case=True, index=None):
+    """Run a FileSearch to the end and get its sorted results"""
+    search = FileSearch(root, pattern, literal, ignore_case, index)
+    results = []
+    while True:
+        found = search.results.get(timeout=30)
+        if found is None:
+            return sorted(results)
+        results.extend(found)
+
+
+class RequiredLiteralsTest(unittest.TestCase):
+    """The literals a regex query narrows the index with must be in every match"""
+
+    def check(self, pattern, expected):
+        self.assertEqual(TrigramIndex.required_literals(pattern), expected)
+
+    def test_plain_text(self):
+        self.check('hello', ['hello'])
+        self.check(r'foo\.bar', ['foo.bar'])
+
+    def test_numeric_and_named_escapes(self):
+        self.check(r'ab\x41cd', ['abAcd'])
+        self.check(r'ab\101cd', ['abAcd'])
+        self.check(r'abAcd', ['abAcd'])
+        self.check(r'ab\N{LATIN CAPITAL LETTER A}cd', ['abAcd'])
+
+    def test_classes_and_backreferences_end_a_run(self):
+        self.check(r'def \w+_cache', ['def ', '_cache'])
+        self.check(r'(abc)\1xyz', ['abc', 'xyz'])
+        self.check('[abc]xyz', ['xyz'])
+
+    def test_quantifiers(self):
+        self.check('ab*cdef', ['cdef'])
+        self.check('xab+cd', ['xab', 'bcd'])
+        self.check('abc?def', ['def'])
+        self.check('x{2,3}yzw', ['xyzw'])
+
+    def test_groups(self):
+        self.check('x(abc)y', ['xabcy'])
+        self.check('(abc)?defg', ['defg'])
+        self.check('(?:foo|bar)baz', ['baz'])
+        self.check('(?x) a b c', ['abc'])
+
+    def test_alternation_gives_nothing(self):
+        self.assertEqual(TrigramIndex.required_literals('abc|def'), [])
+        self.assertIsNone(TrigramIndex.required_literals('(unclosed'))
+
+    def test_parser_failure_gives_nothing(self):
+        with mock.patch.object(app_ctk.regex_parser, 'parse', side_effect=AttributeError):
+            self.assertIsNone(TrigramIndex.required_literals('hello'))
+        with mock.patch.object(app_ctk, 'regex_parser', None):
+            self.assertIsNone(TrigramIndex.required_literals('hello'))
+
+
+class SearchFilesTest(unittest.TestCase):
+    """Matching inside one batch of files"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'sample.py')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('import os\n\ndef first():\n    pass\ndef second(): # Äpfel\n')
+        self.words = os.path.join(self.folder.name, 'words.txt')
+        with open(self.words, 'w', encoding='utf-8') as f:
+            f.write('äpfel\nÖl und öpfel\n')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def matches(self, pattern, literal=False, ignore_case=False, path=None):
+        found = search_files([path or self.path], pattern, literal, ignore_case, 100)
+        return [match[:3] for match in found[0][1]] if found else []
+
+    def test_anchors_match_at_every_line(self):
+        self.assertEqual(self.matches('^def'), [(3, 0, 3), (5, 0, 3)])
+        self.assertEqual(self.matches(r'\):$'), [(3, 10, 2)])
+
+    def test_ignore_case_folds_non_ascii_letters(self):
+        self.assertEqual(self.matches('äpfel', literal=True, ignore_case=True), [(5, 16, 5)])
+        self.assertEqual(self.matches('ÄPFEL', ignore_case=True), [(5, 16, 5)])
+        self.assertEqual(self.matches('äpfel', literal=True), [])
+
+    def test_regexes_match_characters_not_bytes(self):
+        self.assertEqual(self.matches('^.pfel', path=self.words), [(1, 0, 5)])
+        self.assertEqual(self.matches('[äö]pfel', path=self.words), [(1, 0, 5), (2, 7, 5)])
+        self.assertEqual(self.matches(r'\w+ und', path=self.words), [(2, 0, 6)])
+        self.assertEqual(self.matches('[ÄÖ]L', ignore_case=True, path=self.words), [(2, 0, 2)])
+
+
+class TrigramIndexTest(unittest.TestCase):
+    """Searching with the index must find exactly what reading every file finds"""
+
+    QUERIES = [
+        ('import', True, True),
+        ('Import', True, False),
+        (r'ab\x41cd', False, False),
+        (r'def \w+_cache', False, True),
+        ('cache|import', False, True),
+        ('abAcd', True, True),
+        ('äpfel', True, True),
+        ('grüne äpfel', True, True),
+        ('missing text', True, True),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        # Threads keep the tests quick; the workers run the same code either way
+        FileSearch.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+        TrigramIndex.CACHE_DIR = Path(self.root) / 'cache'
+        TrigramIndex.instances.clear()
+        self.write('a.py', 'import os\n\ndef lru_cache():\n    pass\n')
+        self.write('b.txt', 'xx abAcd yy\nGRÜNE Äpfel\n')
+        self.write('sub/c.py', 'from sub import thing\n')
+        self.write('.gitignore', 'cache/\n')
+
+    def tearDown(self):
+        TrigramIndex.instances.clear()
+        self.folder.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def scanned_index(self):
+        index = TrigramIndex.get(self.root)
+        deadline = time.monotonic() + 30
+        while not index.scanned:
+            self.assertLess(time.monotonic(), deadline, "the index was never built")
+            time.sleep(0.01)
+        return index
+
+    def assert_same_results(self, index):
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(run_search(self.root, *query, index=index), run_search(self.root, *query))
+
+    def test_same_results_as_reading_every_file(self):
+        index = self.scanned_index()
+        self.assert_same_results(index)
+        self.assertTrue(run_search(self.root, r'ab\x41cd', False, False, index))
+
+    def test_regex_searches_every_file_without_the_parser(self):
+        index = self.scanned_index()
+        with mock.patch.object(app_ctk.regex_parser, 'parse', side_effect=TypeError):
+            self.assertIsNone(index.candidates('lru_cache', False))
+            self.assertEqual(run_search(self.root, 'lru_cache', False, True, index),
+                             run_search(self.root, 'lru_cache', False, True))
+        self.assertEqual(len(index.candidates('lru_cache', False)), 1)
+
+    def test_escaped_query_still_searches_the_file(self):
+        index = self.scanned_index()
+        path = os.path.join(self.root, 'b.txt')
+        self.assertIn(path, index.candidates(r'ab\x41cd', False))
+        self.assertEqual([found[0] for found in search_files([path], r'ab\x41cd', False, False, 10)], [path])
+
+    def test_files_changed_while_closed(self):
+        self.scanned_index()
+        TrigramIndex.instances.clear()
+        later = self.write('a.py', 'import os\nzebracorn = 1\n')
+        os.utime(later, (time.time() + 10, time.time() + 10))
+        index = TrigramIndex.get(self.root)
+        # Until the first scan has run, the loaded index must not narrow the search
+        if not index.scanned:
+            self.assertIsNone(index.candidates('zebracorn', True))
+        index = self.scanned_index()
+        self.assertEqual(index.candidates('zebracorn', True), [later])
+
+
+if __name__ == '__main__':
+    unittest.main()